@@ -13,14 +13,16 @@ class OracleDbClient(IDbClient):
     """
 
     engine: sqlalchemy.Engine
+    async_engine: object = None
 
-    def __init__(self, db_user: str, db_password: str, db_dsn: str):
+    def __init__(self, db_user: str, db_password: str, db_dsn: str, pool_size: int = 5):
         """
         Init method for OracleDbClient
         @raises DbClientError: If the engine creation fails
         @param db_user: Database user
         @param db_password: Database password
         @param db_dsn: Database DSN
+        @param pool_size: Number of connections kept in the engine pool
         @self.engine: sqlalchemy.Engine object
         @self.logger: Logger object
         """
@@ -30,7 +32,8 @@ class OracleDbClient(IDbClient):
             raise DbClientError("Invalid credentials")
         self.engine = sqlalchemy.create_engine(
             f"oracle+oracledb://{db_user}:{db_password}@{db_dsn}",
-            thick_mode=None
+            thick_mode=None,
+            pool_size=pool_size
         )
         self.logger.info("Sqlalchemy engine created successfully")
 
@@ -52,6 +55,38 @@ class OracleDbClient(IDbClient):
             raise DbClientError("Connection failed") from e
         return conn
 
+    def get_async_engine(self):
+        """
+        Get method for the async engine, it is created on first use with the
+        async mode of oracledb and shares the credentials of the sync engine
+        @raises DbClientError: If the async engine cannot be created
+        @returns: sqlalchemy.ext.asyncio.AsyncEngine object
+        """
+        if self.async_engine is None:
+            try:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                self.async_engine = create_async_engine(
+                    self.engine.url.set(drivername="oracle+oracledb_async"))
+                self.logger.info("Sqlalchemy async engine created successfully")
+            except Exception as e:
+                self.logger.error("Async engine creation failed: %s", e)
+                raise DbClientError("Async engine creation failed") from e
+        return self.async_engine
+
+    async def connect_async(self):
+        """
+        Async connect method for OracleDbClient
+        @raises DbClientError: If the connection fails
+        @returns: sqlalchemy.ext.asyncio.AsyncConnection object
+        """
+        engine = self.get_async_engine()
+        try:
+            conn = await engine.connect()
+        except Exception as e:
+            self.logger.error("Async connection failed: %s", e)
+            raise DbClientError("Async connection failed") from e
+        return conn
+
     def get_engine(self) -> sqlalchemy.Engine:
         """
         Get method for engine
@@ -66,6 +101,8 @@ class OracleDbClient(IDbClient):
         """
         try:
             self.engine.dispose()
+            if self.async_engine is not None:
+                self.async_engine.sync_engine.dispose()
             self.logger.info("Sqlalchemy engine disposed successfully")
         except Exception as e:
             self.logger.error("Engine disposal failed: %s", e)
@@ -1,9 +1,18 @@
 """
 Module for CsvExtractor class
 """
-from io import BytesIO, StringIO
+import asyncio
+import functools
+import importlib.util
+import mmap
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BytesIO
+from typing import AsyncIterator
 import pandas as pd
 from arpaletl.extractor.extractor import IExtractor
+from arpaletl.extractor.schema import SchemaCache, apply_dtypes, parse_datetimes, \
+    parse_with_schema
 from arpaletl.utils.arpaletlerrors import ExtractorError
 from arpaletl.resource.resource import IResource
 from arpaletl.utils.logger import get_logger
@@ -17,34 +26,350 @@ class CsvExtractor(IExtractor):
 
     df: pd.DataFrame
 
-    def __init__(self, resource: IResource):
+    def __init__(self, resource: IResource, engine: str = None, dtype_backend: str = None,
+                 dtypes: dict = None, schema_cache: SchemaCache = None,
+                 datetimes=None, tz: str = None, executor: Executor = None,
+                 dayfirst: bool = False, ambiguous="raise", nonexistent="raise"):
         """
         Constructor for CsvExtractor
+        @param engine: Parser engine of pandas.read_csv, "c", "python" or "pyarrow" (multithreaded)
+        @param dtype_backend: Backend of the parsed dtypes, "numpy_nullable" or "pyarrow"
+        for Arrow backed columns that keep strings compact
+        @param dtypes: Mapping of column to dtype passed to the parser, it skips inference
+        @param schema_cache: Cache that learns compact dtypes on the first extraction of
+        the resource and passes them to the parser on the next ones, ignored with @dtypes
+        @param datetimes: Datetime columns, a list or a mapping of column to format,
+        the format of a column without one is detected once and kept with the schema
+        @param tz: Timezone of the datetime columns
+        @param executor: Thread or process executor that parses the CSV off the event loop,
+        defaults to the default executor of the loop
+        @param dayfirst: Prefer the day first formats when detecting the datetime formats
+        @param ambiguous: How the datetimes repeated by a DST change are localized to @tz,
+        passed to pandas tz_localize, e.g. "NaT" or "infer"
+        @param nonexistent: How the datetimes skipped by a DST change are localized to @tz,
+        passed to pandas tz_localize, e.g. "NaT" or "shift_forward"
+        @raises: ExtractorError: if the pyarrow options are requested without pyarrow installed
         @self.resource: Takes a resource from a IResource object
         @self.logger: Logger object
+        @self.read_options: Options passed to pandas.read_csv
+        @self.dtypes: Explicit dtypes of the columns
+        @self.schema_cache: Cache of the learned dtypes
+        @self.datetimes: Mapping of datetime column to explicit format or None
+        @self._formats: Detected datetime formats when there is no @self.schema_cache
+        @self.executor: Executor that parses the CSV
         """
         self.logger = get_logger(__name__)
         self.resource = resource
+        if "pyarrow" in (engine, dtype_backend) and importlib.util.find_spec("pyarrow") is None:
+            self.logger.error("pyarrow is not installed")
+            raise ExtractorError("pyarrow is not installed")
+        self.read_options = {}
+        if engine is not None:
+            self.read_options["engine"] = engine
+        if dtype_backend is not None:
+            self.read_options["dtype_backend"] = dtype_backend
+        self.dtypes = dtypes
+        self.schema_cache = schema_cache
+        self.datetimes = dict(datetimes) if isinstance(datetimes, dict) \
+            else dict.fromkeys(datetimes or [])
+        self.tz = tz
+        self.dayfirst = dayfirst
+        self.ambiguous = ambiguous
+        self.nonexistent = nonexistent
+        self._formats = {}
+        self.executor = executor
 
     async def extract(self) -> pd.DataFrame:
         """
-        Extract method for CsvExtractor that parses the Iterator from IResource async_open()
+        Extract method for CsvExtractor that parses the buffer from IResource open_buffer(),
+        large resources are parsed from a memory mapped file instead of a copy in memory
         @raises: ExtractorError: if there are problems reading the CSV.
         @returns: Extracted data
         """
         try:
-            buffer = BytesIO()
-            async for chunk in self.resource.open_stream():
-                buffer.write(chunk)
-            if not buffer.seekable():
-                self.logger.error("Buffer is not seekable")
-                raise ExtractorError("Buffer is not seekable")
-            buffer.seek(0)
-            data = buffer.getvalue().decode("utf-8")
-            csv_data = StringIO(data)
-            self.df = pd.read_csv(csv_data)
+            async with self.resource.open_buffer() as buffer:
+                # a worker process needs bytes, threads parse the buffer in place
+                data = buffer.read() if isinstance(self.executor, ProcessPoolExecutor) \
+                    else buffer
+
+                def read(dtypes):
+                    return self._run(_read_csv, data, self._options(dtypes))
+
+                self.df = await parse_with_schema(read, self.resource.uri, self.dtypes,
+                                                  self.schema_cache, self._parse_datetimes,
+                                                  self._offload)
             self.logger.info("CSV resource successfully read")
         except Exception as e:
             self.logger.error("Error reading CSV resource: %s", e)
             raise ExtractorError("Error reading CSV resource") from e
         return self.df
+
+    async def extract_stream(self, chunksize: int = 10000) -> AsyncIterator[pd.DataFrame]:
+        """
+        Extract method for CsvExtractor that parses the stream from IResource open_stream()
+        incrementally and yields DataFrames of @chunksize rows, the last one can be shorter.
+        A CSV with a header and no records yields a single empty DataFrame with its columns.
+        Only complete records are parsed: a record split across two stream chunks, also
+        when a quoted field contains a newline, waits for the rest of its bytes.
+        Every chunk infers its own dtypes unless they are given or learned.
+        @param chunksize: Number of rows of every yielded DataFrame
+        @raises: ExtractorError: if there are problems reading the CSV.
+        @returns: Async iterator of extracted data
+        """
+        try:
+            header = None
+            buffer = bytearray()
+            lines = 0
+            pending = None
+            yielded = False
+            async for chunk in self.resource.open_stream():
+                buffer += chunk
+                lines += chunk.count(b"\n")
+                if header is None:
+                    end = _record_end(buffer, first=True)
+                    if end < 0:
+                        continue
+                    header = bytes(buffer[:end])
+                    del buffer[:end]
+                    lines = buffer.count(b"\n")
+                if lines < chunksize:
+                    continue
+                end = _record_end(buffer)
+                if end < 0:
+                    continue
+                frame = await self._parse(header + buffer[:end])
+                del buffer[:end]
+                lines = buffer.count(b"\n")
+                pending = await self._offload(self._concat, pending, frame)
+                while len(pending) >= chunksize:
+                    yield pending.iloc[:chunksize].reset_index(drop=True)
+                    pending = pending.iloc[chunksize:]
+                    yielded = True
+            if header is None:
+                header, buffer = bytes(buffer), bytearray()
+            if buffer.strip():
+                frame = await self._parse(header + buffer)
+                pending = await self._offload(self._concat, pending, frame)
+            if pending is None:
+                pending = await self._parse(header)
+            if pending.empty and not yielded:
+                # a CSV without records still yields its columns once
+                yield pending.reset_index(drop=True)
+            for start in range(0, len(pending), chunksize):
+                yield pending.iloc[start:start + chunksize].reset_index(drop=True)
+            self.logger.info("CSV resource successfully streamed")
+        except Exception as e:
+            self.logger.error("Error reading CSV resource: %s", e)
+            raise ExtractorError("Error reading CSV resource") from e
+
+    async def extract_parallel(self, workers: int = None,
+                               executor: Executor = None) -> pd.DataFrame:
+        """
+        Extract method for CsvExtractor that splits a file into byte ranges aligned
+        to line boundaries, parses the ranges in parallel processes with the header of
+        the file and concatenates them in order. An unzipped FsResource is read in place,
+        other resources are spooled to a temporary file first with IResource spool().
+        Quoted fields must not contain newlines, since ranges are split on any newline.
+        @param workers: Number of ranges parsed in parallel, defaults to the number of CPUs
+        @param executor: Executor that parses the ranges, defaults to a process pool of @workers
+        @raises: ExtractorError: if there are problems reading the CSV.
+        @returns: Extracted data
+        """
+        workers = workers or os.cpu_count() or 1
+        try:
+            async with self.resource.spool() as path:
+                self.df = await self._parse_ranges(path, workers, executor)
+        except Exception as e:
+            self.logger.error("Error reading CSV resource: %s", e)
+            raise ExtractorError("Error reading CSV resource") from e
+        return self.df
+
+    async def _parse_ranges(self, path, workers: int, executor: Executor) -> pd.DataFrame:
+        """
+        Parse the byte ranges of a CSV file in parallel
+        @param path: Path of the CSV file
+        @param workers: Number of ranges
+        @param executor: Executor that parses the ranges, None for a process pool of @workers
+        @returns: Extracted data
+        """
+        ranges, header = _byte_ranges(path, workers)
+        owned = executor is None
+        executor = executor or ProcessPoolExecutor(max_workers=workers)
+
+        async def read(dtypes):
+            loop = asyncio.get_running_loop()
+            frames = await asyncio.gather(*[
+                loop.run_in_executor(executor, _parse_range, path,
+                                     start, end, header, self._options(dtypes))
+                for start, end in ranges])
+            if frames:
+                return await self._offload(functools.partial(pd.concat, ignore_index=True),
+                                           frames)
+            return await loop.run_in_executor(executor, _read_csv, header, self._options(dtypes))
+
+        try:
+            df = await parse_with_schema(read, self.resource.uri, self.dtypes,
+                                         self.schema_cache, self._parse_datetimes,
+                                         self._offload)
+        finally:
+            if owned:
+                executor.shutdown(wait=False)
+        self.logger.info("CSV resource successfully read in %d ranges", len(ranges))
+        return df
+
+    def _options(self, dtypes: dict) -> dict:
+        """
+        Get the options of pandas.read_csv for a mapping of dtypes
+        @param dtypes: Mapping of column to dtype, None to infer them
+        @returns: Options passed to pandas.read_csv
+        """
+        if not dtypes:
+            return self.read_options
+        return {**self.read_options, "dtype": dtypes}
+
+    def _parse_datetimes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parse the datetime columns with their explicit, cached or detected formats
+        @param df: Parsed DataFrame
+        @returns: DataFrame with the datetime columns parsed
+        """
+        if not self.datetimes:
+            return df
+        options = {"dayfirst": self.dayfirst, "ambiguous": self.ambiguous,
+                   "nonexistent": self.nonexistent}
+        if self.schema_cache is None:
+            return parse_datetimes(df, self.datetimes, self.tz, self._formats, **options)
+        formats = self.schema_cache.formats(self.resource.uri)
+        df = parse_datetimes(df, self.datetimes, self.tz, formats, **options)
+        self.schema_cache.set_formats(self.resource.uri, formats)
+        return df
+
+    async def _parse(self, data: bytes) -> pd.DataFrame:
+        """
+        Parse CSV bytes with the given or learned dtypes
+        @param data: CSV bytes starting with the header
+        @returns: Parsed DataFrame
+        """
+        def read(dtypes):
+            return self._run(_read_csv, bytes(data), self._options(dtypes))
+        return await parse_with_schema(read, self.resource.uri, self.dtypes, self.schema_cache,
+                                       self._parse_datetimes, self._offload)
+
+    def _run(self, func, *args) -> asyncio.Future:
+        """
+        Run a parsing function on @self.executor so that the event loop keeps serving
+        the other coroutines while it runs
+        @param func: Module level function, so that it can be sent to a worker process
+        @param args: Arguments of @func
+        @returns: Future of the result of @func
+        """
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _offload(self, func, *args) -> asyncio.Future:
+        """
+        Run a function that cannot be sent to a worker process, e.g. a bound method that
+        converts or casts a parsed DataFrame, on @self.executor when it runs threads and
+        on the default executor of the loop when it runs processes
+        @param func: Function to run
+        @param args: Arguments of @func
+        @returns: Future of the result of @func
+        """
+        executor = None if isinstance(self.executor, ProcessPoolExecutor) else self.executor
+        return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def _concat(self, pending: pd.DataFrame, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append a parsed chunk to the rows not yielded yet, casting the result back to
+        the given or learned dtypes since chunks with different categories concatenate
+        to object columns
+        @param pending: Rows not yielded yet, None if there are none
+        @param frame: Parsed chunk
+        @returns: Concatenated DataFrame
+        """
+        if pending is None:
+            return frame
+        dtypes = self.dtypes
+        if dtypes is None and self.schema_cache is not None:
+            dtypes = self.schema_cache.get(self.resource.uri)
+        return apply_dtypes(pd.concat([pending, frame], ignore_index=True), dtypes)
+
+
+def _byte_ranges(path, parts: int) -> tuple:
+    """
+    Split the body of a CSV file into at most @parts byte ranges that start on a new line
+    @param path: Path of the CSV file
+    @param parts: Number of ranges
+    @returns: Tuple of the list of (start, end) ranges and the header bytes
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        header = file.readline()
+        start = file.tell()
+        span = max((size - start) // parts, 1)
+        bounds = [start]
+        for part in range(1, parts):
+            file.seek(max(start + part * span - 1, bounds[-1]))
+            file.readline()
+            if file.tell() >= size:
+                break
+            if file.tell() > bounds[-1]:
+                bounds.append(file.tell())
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)
+            if bounds[i + 1] > bounds[i]], header
+
+
+def _read_csv(data, read_options: dict) -> pd.DataFrame:
+    """
+    Parse CSV bytes or a seekable buffer from its start, it runs in the executor
+    of the extractor
+    @param data: CSV bytes, BytesIO or mmap starting with the header
+    @param read_options: Options passed to pandas.read_csv
+    @returns: Parsed DataFrame
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return pd.read_csv(BytesIO(data), **read_options)
+    data.seek(0)
+    if isinstance(data, mmap.mmap) and read_options.get("engine") == "python":
+        # the python engine only reads file objects it knows to be binary
+        return pd.read_csv(BytesIO(data), **read_options)
+    return pd.read_csv(data, **read_options)
+
+
+def _parse_range(path, start: int, end: int, header: bytes, read_options: dict) -> pd.DataFrame:
+    """
+    Parse the byte range [start, end) of a CSV file, it runs in a worker process
+    @param path: Path of the CSV file
+    @param start: First byte of the range
+    @param end: Byte after the range
+    @param header: Header line of the file
+    @param read_options: Options passed to pandas.read_csv
+    @returns: Parsed DataFrame
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return pd.read_csv(BytesIO(header + data), **read_options)
+
+
+def _record_end(buffer: bytearray, first: bool = False) -> int:
+    """
+    Find the end of the last complete CSV record in buffer, a newline is a record end
+    only if it is not inside a quoted field, i.e. it follows an even number of quotes
+    @param buffer: Bytes to search
+    @param first: Find the end of the first complete record instead
+    @returns: Position after the newline that ends the record, -1 if there is none
+    """
+    if first:
+        newline = buffer.find(b"\n")
+        while newline >= 0:
+            if buffer.count(b'"', 0, newline) % 2 == 0:
+                return newline + 1
+            newline = buffer.find(b"\n", newline + 1)
+        return -1
+    newline = buffer.rfind(b"\n")
+    while newline >= 0:
+        if buffer.count(b'"', 0, newline) % 2 == 0:
+            return newline + 1
+        newline = buffer.rfind(b"\n", 0, newline)
+    return -1
@@ -0,0 +1,48 @@
+"""
+Module for extract_many function
+"""
+import asyncio
+from typing import AsyncIterator, Callable, Iterable
+from arpaletl.extractor.extractor import IExtractor
+from arpaletl.resource.resource import IResource
+from arpaletl.utils.logger import get_logger
+
+
+async def extract_many(resources: Iterable[IResource],
+                       extractor: Callable[[IResource], IExtractor], limit: int = 8,
+                       return_exceptions: bool = False, **options) -> AsyncIterator[tuple]:
+    """
+    Extract many resources concurrently, at most @limit at a time, and yield every
+    result as soon as it is complete, so that the whole run takes about as long as
+    the slowest extractions instead of the sum of all of them.
+    E.g. extract_many(resources, partial(CsvExtractor, executor=pool), limit=16)
+    @param resources: Resources to extract
+    @param extractor: Function that builds the extractor of a resource, e.g. an IExtractor class
+    @param limit: Maximum number of extractions running at the same time
+    @param return_exceptions: Yield the exception of a failed extraction in place of its
+    DataFrame instead of raising it and cancelling the other extractions
+    @param options: Keyword arguments of extract(), e.g. gzipped=True
+    @raises: ArpalEtlError: The error of the first failed extraction without @return_exceptions
+    @returns: Async iterator of (resource, DataFrame or exception) tuples in completion order
+    """
+    logger = get_logger(__name__)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(resource):
+        async with semaphore:
+            try:
+                return resource, await extractor(resource).extract(**options)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                logger.error("Error extracting %s: %s", resource.uri, e)
+                return resource, e
+
+    tasks = [asyncio.ensure_future(run(resource)) for resource in resources]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -2,6 +2,7 @@
 Module for IExtractor interface
 """
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 import pandas as pd
 from arpaletl.resource.resource import IResource
 
@@ -29,3 +30,11 @@ class IExtractor(ABC):
         Extract method for IExtractor
         @returns: Extracted data
         """
+
+    async def extract_stream(self) -> AsyncIterator[pd.DataFrame]:
+        """
+        Extract method for IExtractor that yields the data in DataFrame chunks,
+        by default the whole extracted data is a single chunk
+        @returns: Async iterator of extracted data
+        """
+        yield await self.extract()
@@ -0,0 +1,122 @@
+"""
+Module for FlattenSpec class
+"""
+import pandas as pd
+from arpaletl.utils.arpaletlerrors import ExtractorError
+
+
+class FlattenSpec:
+    """
+    Class that declares how nested JSON records become a flat DataFrame.
+    Every level of @record_path is exploded and expanded a whole column at a time,
+    nested objects become columns named by their path joined with @sep.
+    E.g. stations with sensors with measurements:
+    FlattenSpec(record_path=["sensors", "measurements"],
+                meta=["station_id", "location.lat", "sensors.code"])
+    gives one row per measurement with the measurement fields plus the selected
+    station and sensor fields.
+    """
+
+    def __init__(self, record_path: list = None, meta: list = None, explode: list = None,
+                 sep: str = ".", dtypes: dict = None, meta_prefix: str = None):
+        """
+        Constructor for FlattenSpec
+        @param record_path: Keys of the nested lists of records to descend, in order
+        @param meta: Paths of the fields of the parent levels kept on every record,
+        joined with @sep, None keeps every parent field
+        @param explode: List columns of the records turned into one row per element
+        @param sep: Separator of the names of nested columns
+        @param dtypes: Mapping of column to dtype applied to the flat DataFrame,
+        the columns without an entry get their dtype inferred
+        @param meta_prefix: Prefix of the names of the parent fields, needed when a parent
+        field has the same name as a record field, e.g. "station."
+        """
+        self.record_path = list(record_path or [])
+        self.meta = meta
+        self.explode = list(explode or [])
+        self.sep = sep
+        self.dtypes = dtypes or {}
+        self.meta_prefix = meta_prefix or ""
+
+    def apply(self, json_data) -> pd.DataFrame:
+        """
+        Flatten decoded JSON records
+        @param json_data: List of records, a single record, or a DataFrame of records
+        @raises ExtractorError: If a path of the spec is not in the data or a parent field
+        has the same name as a record field
+        @returns: Flat DataFrame
+        """
+        if isinstance(json_data, dict):
+            json_data = [json_data]
+        frame = _expand(pd.DataFrame(json_data), self.sep)
+        prefix = ""
+        for key in self.record_path:
+            column = prefix + key
+            if column not in frame.columns:
+                raise ExtractorError(f"Record path {column} not found in JSON")
+            frame = frame.explode(column, ignore_index=True)
+            frame = frame[frame[column].notna()]
+            children = pd.DataFrame(frame[column].tolist(), index=frame.index)
+            prefix = column + self.sep
+            children.columns = [prefix + str(col) for col in children.columns]
+            frame = _expand(frame.drop(columns=[column]).join(children), self.sep)
+            frame = frame.reset_index(drop=True)
+
+        records = [col for col in frame.columns if col.startswith(prefix)]
+        parents = [col for col in frame.columns if not col.startswith(prefix)]
+        if self.meta is not None and self.record_path:
+            metas = [self.sep.join(path) if isinstance(path, list) else path
+                     for path in self.meta]
+            missing = [path for path in metas if path not in parents]
+            if missing:
+                raise ExtractorError(f"Meta fields not found in JSON: {missing}")
+            parents = metas
+        names = {col: col[len(prefix):] for col in records}
+        names.update({col: self.meta_prefix + col for col in parents})
+        conflicts = sorted({names[col] for col in parents} & {names[col] for col in records})
+        if conflicts:
+            raise ExtractorError(f"Conflicting field names in JSON: {conflicts}, "
+                                 "set meta_prefix to tell the parent fields apart")
+        frame = frame[records + parents].rename(columns=names)
+
+        for column in self.explode:
+            if column not in frame.columns:
+                raise ExtractorError(f"Explode column {column} not found in JSON")
+            frame = frame.explode(column, ignore_index=True)
+        frame = frame.infer_objects()
+        if self.dtypes:
+            frame = frame.astype(self.dtypes)
+        return frame
+
+
+def _expand(frame: pd.DataFrame, sep: str) -> pd.DataFrame:
+    """
+    Replace the columns holding objects with one column per key, recursively
+    @param frame: DataFrame to expand
+    @param sep: Separator of the names of nested columns
+    @returns: DataFrame without object columns
+    """
+    while True:
+        nested = [col for col in frame.columns
+                  if frame[col].dtype == object and isinstance(_first_valid(frame[col]), dict)]
+        if not nested:
+            return frame
+        for column in nested:
+            values = frame[column]
+            valid = values.notna()
+            children = pd.DataFrame(values[valid].tolist(), index=values.index[valid]) \
+                .reindex(values.index)
+            children.columns = [f"{column}{sep}{col}" for col in children.columns]
+            position = frame.columns.get_loc(column)
+            frame = pd.concat([frame.iloc[:, :position], children,
+                               frame.iloc[:, position + 1:]], axis=1)
+
+
+def _first_valid(values: pd.Series):
+    """
+    Get the first value of a Series that is not missing
+    @param values: Series to search
+    @returns: First valid value, None if every value is missing
+    """
+    index = values.first_valid_index()
+    return None if index is None else values.loc[index]
@@ -1,11 +1,20 @@
 """
 Module for JSONExtractor class
 """
+import asyncio
+import codecs
+import importlib
 import json
-import gzip
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor
 from io import BytesIO
+from typing import AsyncIterator
 import pandas as pd
 from arpaletl.extractor.extractor import IExtractor
+from arpaletl.extractor.flatten import FlattenSpec
+from arpaletl.extractor.jsonstream import JSONStreamParser
+from arpaletl.extractor.schema import SchemaCache, apply_dtypes, parse_datetimes, \
+    parse_with_schema
 from arpaletl.utils.arpaletlerrors import ExtractorError, ResourceError
 from arpaletl.resource.resource import IResource
 from arpaletl.utils.logger import get_logger
@@ -19,43 +28,77 @@ class JSONExtractor(IExtractor):
 
     df: pd.DataFrame
 
-    def __init__(self, resource: IResource):
+    def __init__(self, resource: IResource, decoder: str = "json", flatten: FlattenSpec = None,
+                 dtypes: dict = None, schema_cache: SchemaCache = None,
+                 datetimes=None, tz: str = None, executor: Executor = None,
+                 dayfirst: bool = False, ambiguous="raise", nonexistent="raise"):
         """
         Constructor for JSONExtractor
+        @param decoder: JSON decoding backend, "json" for the standard library, "orjson" or
+        "auto" to use orjson when it is installed. orjson is faster but not a drop in
+        replacement: documents it refuses, e.g. with NaN or Infinity, are decoded again with
+        json and integers wider than 64 bits become floats
+        @param flatten: Spec that turns nested records into a flat typed DataFrame
+        @param dtypes: Mapping of column to dtype applied to the extracted DataFrame
+        @param schema_cache: Cache that learns compact dtypes on the first extraction of
+        the resource and applies them on the next ones, ignored with @dtypes
+        @param datetimes: Datetime columns, a list or a mapping of column to format,
+        the format of a column without one is detected once and kept with the schema
+        @param tz: Timezone of the datetime columns
+        @param executor: Thread or process executor that decodes the JSON and builds the
+        DataFrame off the event loop, defaults to the default executor of the loop
+        @param dayfirst: Prefer the day first formats when detecting the datetime formats
+        @param ambiguous: How the datetimes repeated by a DST change are localized to @tz,
+        passed to pandas tz_localize, e.g. "NaT" or "infer"
+        @param nonexistent: How the datetimes skipped by a DST change are localized to @tz,
+        passed to pandas tz_localize, e.g. "NaT" or "shift_forward"
+        @raises: ExtractorError: if the decoder is unknown or not installed.
         @self.resource: Takes a resource from a IResource object
         @self.logger: Logger object
+        @self.loads: Function that decodes a JSON document
+        @self.dtypes: Explicit dtypes of the columns
+        @self.schema_cache: Cache of the learned dtypes
+        @self.datetimes: Mapping of datetime column to explicit format or None
+        @self._formats: Detected datetime formats when there is no @self.schema_cache
+        @self.executor: Executor that decodes the JSON
         """
         self.logger = get_logger(__name__)
         self.resource = resource
+        self.loads = _json_loads(decoder)
+        self.flatten = flatten
+        self.dtypes = dtypes
+        self.schema_cache = schema_cache
+        self.datetimes = dict(datetimes) if isinstance(datetimes, dict) \
+            else dict.fromkeys(datetimes or [])
+        self.tz = tz
+        self.dayfirst = dayfirst
+        self.ambiguous = ambiguous
+        self.nonexistent = nonexistent
+        self._formats = {}
+        self.executor = executor
+        self.logger.info("Using %s to decode JSON",
+                         "orjson" if self.loads is _orjson_loads else "json")
 
     async def extract(self, gzipped: bool = False) -> pd.DataFrame:
         """
-        Extract method for JSONExtractor that parses the Iterator from IResource async_open()
+        Extract method for JSONExtractor that parses the buffer from IResource open_buffer(),
+        or the decompressed stream if @gzipped
         @param gzipped: If the data is gzipped
         @raises: ExtractorError: if there are problems reading the JSON.
         @raises: ResourceError: if there are problems opening the resource.
         @returns: Extracted data
         """
         try:
-            buffer = BytesIO()
-            async for chunk in self.resource.open_stream():
-                buffer.write(chunk)
-            if not buffer.seekable():
-                self.logger.error("Buffer is not seekable")
-                raise ExtractorError("Buffer is not seekable")
-            if gzipped is True:
-                if not buffer.getvalue().startswith(b"\x1f\x8b"):
-                    self.logger.error(
-                        "Data is not gzipped please set gzipped to False or check the data source")
-                    raise ExtractorError(
-                        "Data is not gzipped please set gzipped to False or check the data source")
-                buffer.seek(0)
-                data = gzip.decompress(buffer.getvalue())
-            else:
-                buffer.seek(0)
+            if gzipped:
+                buffer = BytesIO()
+                async for chunk in self._open_stream(gzipped):
+                    buffer.write(chunk)
                 data = buffer.getvalue()
-            json_data = json.loads(data.decode("utf-8"))
-            self.df = pd.DataFrame(json_data)
+            else:
+                # spooled to disk while downloading, only the decoded copy is kept in memory
+                async with self.resource.open_buffer() as buffer:
+                    data = buffer.read()
+            self.df = await self._to_frame(_decode_frame, self.loads, data)
             self.logger.info("JSON resource successfully read")
         except ResourceError as e:
             self.logger.error("Error opening resource: %s", e)
@@ -64,3 +107,198 @@ class JSONExtractor(IExtractor):
             self.logger.error("Error reading JSON: %s", e)
             raise ExtractorError("Error reading JSON") from e
         return self.df
+
+    async def extract_stream(self, batch_size: int = 10000, record_path: str = None,
+                             ndjson: bool = False,
+                             gzipped: bool = False) -> AsyncIterator[pd.DataFrame]:
+        """
+        Extract method for JSONExtractor that parses the stream from IResource open_stream()
+        incrementally and yields DataFrames of @batch_size records, the last one can be shorter.
+        The records are the lines of newline delimited JSON or the elements of a JSON array,
+        the top level one or the one at @record_path.
+        @param batch_size: Number of records of every yielded DataFrame
+        @param record_path: Dotted path of the array of records, e.g. "data.items"
+        @param ndjson: If the resource is newline delimited JSON
+        @param gzipped: If the data is gzipped
+        @raises: ExtractorError: if there are problems reading the JSON.
+        @returns: Async iterator of extracted data
+        """
+        try:
+            parser = JSONStreamParser(record_path, ndjson, self.loads)
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            records = []
+            async for chunk in self._open_stream(gzipped):
+                records += await self._offload(_feed, parser, decoder, chunk)
+                while len(records) >= batch_size:
+                    yield await self._to_frame(_frame, records[:batch_size])
+                    del records[:batch_size]
+            records += await self._offload(_feed, parser, decoder, b"", True)
+            for start in range(0, len(records), batch_size):
+                yield await self._to_frame(_frame, records[start:start + batch_size])
+            self.logger.info("JSON resource successfully streamed")
+        except ResourceError as e:
+            self.logger.error("Error opening resource: %s", e)
+            raise ExtractorError("Error opening resource") from e
+        except Exception as e:
+            self.logger.error("Error reading JSON: %s", e)
+            raise ExtractorError("Error reading JSON") from e
+
+    async def _to_frame(self, build, *args) -> pd.DataFrame:
+        """
+        Build a DataFrame on @self.executor, flattened with @self.flatten if set
+        and cast to the given or learned dtypes
+        @param build: Module level function called with @args, @self.flatten and the dtypes
+        @param args: JSON data the DataFrame is built from
+        @returns: DataFrame object
+        """
+        def parse(dtypes):
+            return asyncio.get_running_loop().run_in_executor(
+                self.executor, build, *args, self.flatten, dtypes)
+        return await parse_with_schema(parse, self.resource.uri, self.dtypes, self.schema_cache,
+                                       self._parse_datetimes, self._offload)
+
+    def _offload(self, func, *args) -> asyncio.Future:
+        """
+        Run a function that cannot be sent to a worker process, e.g. a bound method that
+        converts or casts a built DataFrame, on @self.executor when it runs threads and
+        on the default executor of the loop when it runs processes
+        @param func: Function to run
+        @param args: Arguments of @func
+        @returns: Future of the result of @func
+        """
+        executor = None if isinstance(self.executor, ProcessPoolExecutor) else self.executor
+        return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def _parse_datetimes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Parse the datetime columns with their explicit, cached or detected formats
+        @param df: Parsed DataFrame
+        @returns: DataFrame with the datetime columns parsed
+        """
+        if not self.datetimes:
+            return df
+        options = {"dayfirst": self.dayfirst, "ambiguous": self.ambiguous,
+                   "nonexistent": self.nonexistent}
+        if self.schema_cache is None:
+            return parse_datetimes(df, self.datetimes, self.tz, self._formats, **options)
+        formats = self.schema_cache.formats(self.resource.uri)
+        df = parse_datetimes(df, self.datetimes, self.tz, formats, **options)
+        self.schema_cache.set_formats(self.resource.uri, formats)
+        return df
+
+    async def _open_stream(self, gzipped: bool) -> AsyncIterator[bytes]:
+        """
+        Stream the chunks of IResource open_stream(), decompressing them on the fly if
+        @gzipped so that the compressed payload is never held in memory as a whole.
+        Concatenated gzip members are decompressed one after the other.
+        @param gzipped: If the data is gzipped
+        @raises: ExtractorError: if the data is not gzipped or it is truncated.
+        @returns: Async iterator of the decompressed chunks
+        """
+        if not gzipped:
+            async for chunk in self.resource.open_stream():
+                yield chunk
+            return
+        head = b""
+        decompressor = None
+        async for chunk in self.resource.open_stream():
+            if head is not None:
+                head += chunk
+                if len(head) < 2:
+                    continue
+                if not head.startswith(b"\x1f\x8b"):
+                    break
+                chunk, head = head, None
+            while chunk:
+                if decompressor is None:
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = None
+                else:
+                    chunk = b""
+        if head is not None:
+            self.logger.error(
+                "Data is not gzipped please set gzipped to False or check the data source")
+            raise ExtractorError(
+                "Data is not gzipped please set gzipped to False or check the data source")
+        if decompressor is not None:
+            self.logger.error("Gzipped data is truncated")
+            raise ExtractorError("Gzipped data is truncated")
+
+
+def _feed(parser: JSONStreamParser, decoder, chunk: bytes, final: bool = False) -> list:
+    """
+    Decode a chunk of the stream and parse it, it runs in the executor of the extractor
+    since decoding the records is the heavy part of streaming
+    @param parser: Parser of the stream
+    @param decoder: Incremental UTF-8 decoder of the stream
+    @param chunk: Next chunk of the stream
+    @param final: If the stream ended, the parser is closed
+    @returns: List of the records completed by @chunk
+    """
+    records = parser.feed(decoder.decode(chunk, final))
+    return records + parser.close() if final else records
+
+
+def _frame(json_data, flatten: FlattenSpec, dtypes: dict) -> pd.DataFrame:
+    """
+    Build a DataFrame from decoded JSON, it runs in the executor of the extractor
+    @param json_data: Decoded JSON
+    @param flatten: Spec that flattens the records, None to use them as they are
+    @param dtypes: Mapping of column to dtype, None to infer them
+    @returns: DataFrame object
+    """
+    if flatten is not None:
+        return apply_dtypes(flatten.apply(json_data), dtypes)
+    return apply_dtypes(pd.DataFrame(json_data), dtypes)
+
+
+def _decode_frame(loads, data: bytes, flatten: FlattenSpec, dtypes: dict) -> pd.DataFrame:
+    """
+    Decode a JSON document and build a DataFrame from it, it runs in the executor
+    of the extractor
+    @param loads: Function that decodes the JSON document
+    @param data: JSON document
+    @param flatten: Spec that flattens the records, None to use them as they are
+    @param dtypes: Mapping of column to dtype, None to infer them
+    @returns: DataFrame object
+    """
+    return _frame(loads(data), flatten, dtypes)
+
+
+def _json_loads(decoder: str):
+    """
+    Get the loads function of a JSON decoding backend
+    @param decoder: "orjson", "json" or "auto"
+    @raises: ExtractorError: if the decoder is unknown or not installed.
+    @returns: Function that decodes a JSON document from bytes or str
+    """
+    if decoder not in ("auto", "orjson", "json"):
+        raise ExtractorError(f"Unknown JSON decoder {decoder}")
+    if decoder in ("auto", "orjson"):
+        try:
+            importlib.import_module("orjson")
+            return _orjson_loads
+        except ImportError as e:
+            if decoder == "orjson":
+                raise ExtractorError("orjson is not installed") from e
+    return json.loads
+
+
+def _orjson_loads(data):
+    """
+    Decode a JSON document with orjson, the documents that orjson refuses but json accepts,
+    e.g. with NaN or Infinity, are decoded with json
+    @param data: JSON document as bytes or str
+    @raises: ValueError: if the document is not valid JSON
+    @returns: Decoded JSON
+    """
+    orjson = importlib.import_module("orjson")
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
@@ -0,0 +1,194 @@
+"""
+Module for JSONStreamParser class
+"""
+import json
+import re
+from arpaletl.utils.arpaletlerrors import ExtractorError
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING = re.compile(r'["\\]')
+_DELIMITER = re.compile(r"[ \t\n\r,\]}]")
+
+
+class JSONStreamParser:
+    """
+    Class that parses JSON text fed in pieces and returns the records as soon as they are
+    complete, so that only the record being parsed is kept in memory. It reads newline
+    delimited JSON or the elements of a JSON array, the top level one or the one found at
+    a dotted record path such as "data.items". Values before the array are skipped and
+    everything after the end of the array is ignored.
+    """
+
+    def __init__(self, record_path: str = None, ndjson: bool = False, loads=json.loads):
+        """
+        Constructor for JSONStreamParser
+        @param record_path: Dotted path of the array of records inside the top level object
+        @param ndjson: If the text is newline delimited JSON, @record_path is ignored
+        @param loads: Function that decodes every line of newline delimited JSON
+        @self._path: Keys still to be found before the array of records
+        @self._state: "object" while looking for a key, "skip" inside the value of another key,
+        "array" inside the records, "done"
+        @self._buffer: Text not yet parsed
+        @self._scan: Progress of the scan of the incomplete value at the start of the buffer,
+        as (characters scanned, nesting depth, inside a string), None between values
+        """
+        self.ndjson = ndjson
+        self.loads = loads
+        self.decoder = json.JSONDecoder()
+        self._path = record_path.split(".") if record_path else []
+        self._state = None
+        self._buffer = ""
+        self._scan = None
+
+    def feed(self, text: str) -> list:
+        """
+        Parse a piece of text
+        @param text: Next piece of the JSON text
+        @raises ExtractorError: If the text is not valid for the configured layout
+        @returns: List of the records completed by @text
+        """
+        self._buffer += text
+        if self.ndjson:
+            lines = self._buffer.split("\n")
+            self._buffer = lines.pop()
+            return [self.loads(line) for line in lines if line.strip()]
+        records = []
+        pos = self._parse(records)
+        self._buffer = "" if self._state == "done" else self._buffer[pos:]
+        return records
+
+    def close(self) -> list:
+        """
+        Parse the rest of the text at the end of the input
+        @raises ExtractorError: If the text ends before the array of records
+        @returns: List of the last records
+        """
+        if self.ndjson:
+            records = [self.loads(self._buffer)] if self._buffer.strip() else []
+            self._buffer = ""
+            return records
+        if self._state != "done":
+            raise ExtractorError("JSON ended before the end of the array of records")
+        return []
+
+    def _parse(self, records: list) -> int:
+        """
+        Advance the state machine over the buffer, appending the completed records
+        @param records: List the records are appended to
+        @raises ExtractorError: If the text is not valid for the configured layout
+        @returns: Position of the first character that still has to be parsed
+        """
+        buffer = self._buffer
+        pos = 0
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer) or self._state == "done":
+                return pos
+            char = buffer[pos]
+            if self._state is None:
+                expected = "{" if self._path else "["
+                if char != expected:
+                    raise ExtractorError(f"Expected '{expected}' in JSON, found '{char}'")
+                self._state = "object" if self._path else "array"
+                pos += 1
+            elif self._state == "array":
+                if char == "]":
+                    self._state = "done"
+                    pos += 1
+                    continue
+                if char == ",":
+                    pos += 1
+                    continue
+                decoded = self._decode(buffer, pos)
+                if decoded is None:
+                    return pos
+                record, pos = decoded
+                records.append(record)
+            elif self._state == "skip":
+                end = self._value_end(buffer, pos)
+                if end < 0:
+                    return pos
+                self._state = "object"
+                pos = end
+            else:
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "}":
+                    raise ExtractorError(f"Record path not found in JSON: {self._path[0]}")
+                decoded = self._decode(buffer, pos)
+                if decoded is None:
+                    return pos
+                key, end = decoded
+                if not isinstance(key, str):
+                    raise ExtractorError(f"Expected a key in JSON, found {key!r}")
+                colon = _WHITESPACE.match(buffer, end).end()
+                value = _WHITESPACE.match(buffer, colon + 1).end()
+                if value >= len(buffer):
+                    return pos
+                if buffer[colon] != ":":
+                    raise ExtractorError(f"Expected ':' in JSON, found '{buffer[colon]}'")
+                if key == self._path[0]:
+                    self._path.pop(0)
+                    self._state = None
+                else:
+                    self._state = "skip"
+                pos = value
+
+    def _decode(self, buffer: str, pos: int):
+        """
+        Decode the JSON value that starts at @pos once the whole value is in the buffer
+        @param buffer: Text to decode
+        @param pos: Position of the value
+        @raises ExtractorError: If the complete value is not valid JSON
+        @returns: Tuple of the value and the position after it, None if it is not complete yet
+        """
+        end = self._value_end(buffer, pos)
+        if end < 0:
+            return None
+        try:
+            return self.decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            raise ExtractorError(f"Invalid JSON: {e}") from e
+
+    def _value_end(self, buffer: str, pos: int) -> int:
+        """
+        Find the end of the JSON value that starts at @pos tracking the nesting depth and the
+        strings, so that every character is scanned once however many pieces the value spans.
+        The scan of an incomplete value resumes from @self._scan at the next piece.
+        @param buffer: Text to scan
+        @param pos: Position of the value
+        @returns: Position after the value, -1 if it is not complete yet
+        """
+        if self._scan is None and buffer[pos] not in '[{"':
+            # a number or literal ends at the first delimiter, it may continue in the next piece
+            match = _DELIMITER.search(buffer, pos)
+            return match.start() if match else -1
+        scanned, depth, in_string = self._scan or (0, 0, False)
+        end = pos + scanned
+        while True:
+            match = (_STRING if in_string else _STRUCTURAL).search(buffer, end)
+            if match is None:
+                end = len(buffer)
+                break
+            char = match.group()
+            if char == "\\":
+                if match.end() >= len(buffer):
+                    # the escaped character is in the next piece
+                    end = match.start()
+                    break
+                end = match.end() + 1
+                continue
+            end = match.end()
+            if char == '"':
+                in_string = not in_string
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0 and not in_string:
+                self._scan = None
+                return end
+        self._scan = (end - pos, depth, in_string)
+        return -1
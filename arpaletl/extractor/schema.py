@@ -0,0 +1,306 @@
+"""
+Module for SchemaCache class and the dtype helpers of the extractors
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import tempfile
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from arpaletl.utils.arpaletlerrors import ExtractorError
+from arpaletl.utils.logger import get_logger
+
+_INT32 = np.iinfo(np.int32)
+_FORMAT_SAMPLE = 100
+
+
+class SchemaCache:
+    """
+    Class that persists the dtypes and datetime formats of every resource in a JSON file
+    keyed by resource URI. The first extraction of a resource learns compact dtypes from
+    the parsed DataFrame and detects the formats of its datetime columns, the next ones
+    pass them to the parser up front so that no inference pass is needed and every run
+    of the same feed gets the same dtypes.
+    """
+
+    def __init__(self, path, category_ratio: float = 0.5):
+        """
+        Constructor for SchemaCache
+        @param path: Path of the JSON file, it is created on the first learned schema
+        @param category_ratio: Maximum ratio of distinct values to rows of a string
+        column stored as category
+        @raises ExtractorError: If the file exists and is not a valid schema file
+        @self._schemas: Mapping of resource URI to a mapping of column to dtype name
+        @self._formats: Mapping of resource URI to a mapping of column to datetime format
+        @self._lock: Lock that guards the schemas across concurrent extractions
+        """
+        self.logger = get_logger(__name__)
+        self.path = path
+        self.category_ratio = category_ratio
+        self._lock = threading.Lock()
+        self._schemas = {}
+        self._formats = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    content = json.load(file)
+                self._schemas = content["dtypes"]
+                self._formats = content["formats"]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.logger.error("Error reading schema file: %s", e)
+                raise ExtractorError("Error reading schema file") from e
+
+    def get(self, uri) -> dict:
+        """
+        Get the learned dtypes of a resource
+        @param uri: URI of the resource
+        @returns: Mapping of column to dtype name, None if the resource was never learned
+        """
+        with self._lock:
+            dtypes = self._schemas.get(str(uri))
+            return dict(dtypes) if dtypes is not None else None
+
+    def learn(self, uri, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compact the columns of @df without a learned dtype and persist their dtypes
+        @param uri: URI of the resource
+        @param df: Parsed DataFrame
+        @returns: DataFrame with compact dtypes
+        """
+        with self._lock:
+            known = self._schemas.get(str(uri), {})
+            new = [col for col in df.columns if str(col) not in known]
+            if not new:
+                return df
+            dtypes = compact_dtypes(df[new], self.category_ratio)
+            if not dtypes:
+                # only columns without a compact dtype, e.g. datetimes, nothing to persist
+                return df
+            self._schemas[str(uri)] = {**known, **dtypes}
+            self._save()
+        self.logger.info("Learned dtypes of %d columns of %s", len(dtypes), uri)
+        return apply_dtypes(df, dtypes)
+
+    def formats(self, uri) -> dict:
+        """
+        Get the detected datetime formats of a resource
+        @param uri: URI of the resource
+        @returns: Mapping of column to datetime format, empty if none was detected
+        """
+        with self._lock:
+            return dict(self._formats.get(str(uri), {}))
+
+    def set_formats(self, uri, formats: dict) -> None:
+        """
+        Persist the datetime formats of a resource if they changed
+        @param uri: URI of the resource
+        @param formats: Mapping of column to datetime format
+        """
+        with self._lock:
+            if self._formats.get(str(uri), {}) == formats:
+                return
+            self._formats[str(uri)] = dict(formats)
+            self._save()
+
+    def invalidate(self, uri) -> None:
+        """
+        Forget the dtypes and datetime formats of a resource, e.g. after its feed changed
+        @param uri: URI of the resource
+        """
+        with self._lock:
+            dtypes = self._schemas.pop(str(uri), None)
+            formats = self._formats.pop(str(uri), None)
+            if dtypes is not None or formats is not None:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Write the schemas to a temporary file and move it over @self.path,
+        so that a reader never sees a partially written file
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory,
+                                         suffix=".tmp", delete=False) as file:
+            json.dump({"dtypes": self._schemas, "formats": self._formats}, file,
+                      indent=1, sort_keys=True)
+        os.replace(file.name, self.path)
+
+
+def compact_dtypes(df: pd.DataFrame, category_ratio: float = 0.5) -> dict:
+    """
+    Choose compact dtypes for the columns of a DataFrame: int32 for integers that fit,
+    float32 for floats that survive the cast unchanged, category for strings with few
+    distinct values.
+    Columns of other kinds, e.g. lists or datetimes, are left out.
+    @param df: DataFrame to inspect
+    @param category_ratio: Maximum ratio of distinct values to rows of a category column
+    @returns: Mapping of column to dtype name
+    """
+    dtypes = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values):
+            dtypes[str(column)] = str(values.dtype)
+        elif pd.api.types.is_integer_dtype(values):
+            fits = values.empty or (values.min() >= _INT32.min and values.max() <= _INT32.max)
+            dtypes[str(column)] = "int32" if fits else "int64"
+        elif pd.api.types.is_float_dtype(values):
+            dtypes[str(column)] = "float32" if _fits_float32(values) else str(values.dtype)
+        elif pd.api.types.infer_dtype(values, skipna=True) == "string":
+            distinct = values.nunique()
+            small = len(values) > 0 and distinct <= category_ratio * len(values)
+            dtypes[str(column)] = "category" if small else "str"
+    return dtypes
+
+
+def _fits_float32(values: pd.Series) -> bool:
+    """
+    Tell if a float column keeps every value when cast to float32, so that ids held as
+    floats or coordinates do not lose digits
+    @param values: Float column
+    @returns: True if the round trip through float32 is exact
+    """
+    original = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(over="ignore"):
+        return np.array_equal(original, original.astype(np.float32).astype(np.float64),
+                              equal_nan=True)
+
+
+def apply_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Cast the columns of @df that have an entry in @dtypes
+    @param df: DataFrame to cast
+    @param dtypes: Mapping of column to dtype
+    @returns: Cast DataFrame
+    """
+    present = {col: dtype for col, dtype in (dtypes or {}).items() if col in df.columns}
+    return df.astype(present) if present else df
+
+
+def parse_datetimes(df: pd.DataFrame, columns: dict, tz: str = None,
+                    formats: dict = None, dayfirst: bool = False, ambiguous="raise",
+                    nonexistent="raise") -> pd.DataFrame:
+    """
+    Parse datetime columns a whole column at a time with a fixed format, so that pandas
+    never falls back to parsing every element on its own. The format of a column without
+    an explicit one is detected once from a sample of its values and kept in @formats.
+    @param df: DataFrame with the datetime columns as strings
+    @param columns: Mapping of column to explicit format, None to detect it
+    @param tz: Timezone the naive datetimes are localized to and the aware ones converted to
+    @param formats: Detected formats, updated in place, a format that no longer fits
+    the column is detected again
+    @param dayfirst: Prefer the day first formats when detecting the format of a column
+    whose sample fits both, e.g. 01/02/2024
+    @param ambiguous: How the naive datetimes repeated by a DST change are localized,
+    passed to pandas tz_localize, e.g. "NaT" or "infer"
+    @param nonexistent: How the naive datetimes skipped by a DST change are localized,
+    passed to pandas tz_localize, e.g. "NaT" or "shift_forward"
+    @raises ExtractorError: If a column is missing or its format cannot be detected
+    @raises ValueError: If a column does not match its explicit format
+    @returns: DataFrame with the parsed columns
+    """
+    formats = {} if formats is None else formats
+    parsed = {}
+    for column, explicit in columns.items():
+        if column not in df.columns:
+            raise ExtractorError(f"Datetime column {column} not found")
+        values = df[column]
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            fmt = explicit or formats.get(column) or _detect_format(values, column, dayfirst)
+            try:
+                values = pd.to_datetime(values, format=fmt)
+            except ValueError:
+                if explicit or column not in formats:
+                    raise
+                fmt = _detect_format(values, column, dayfirst)
+                values = pd.to_datetime(values, format=fmt)
+            if not explicit:
+                formats[column] = fmt
+        if tz is not None:
+            values = values.dt.tz_localize(tz, ambiguous=ambiguous, nonexistent=nonexistent) \
+                if values.dt.tz is None else values.dt.tz_convert(tz)
+        parsed[column] = values
+    return df.assign(**parsed) if parsed else df
+
+
+def _detect_format(values: pd.Series, column: str, dayfirst: bool = False) -> str:
+    """
+    Detect the datetime format of a column from a sample of its values spread over the
+    column: the formats guessed from the sampled values are tried in turn and the first
+    one that parses the whole sample wins, so that 01/02/2024 followed by 25/02/2024
+    is read day first
+    @param values: Column of datetime strings
+    @param column: Name of the column
+    @param dayfirst: Prefer the day first formats for the values that fit both
+    @raises ExtractorError: If no format parses the sample
+    @returns: strftime format
+    """
+    valid = values.dropna()
+    if len(valid) > _FORMAT_SAMPLE:
+        valid = valid.iloc[np.linspace(0, len(valid) - 1, _FORMAT_SAMPLE).astype(int)]
+    sample = valid.astype(str).drop_duplicates()
+    with warnings.catch_warnings():
+        # an unambiguous day first value is detected right, pandas only warns about it
+        warnings.simplefilter("ignore", UserWarning)
+        guesses = [guess_datetime_format(value, dayfirst=dayfirst) for value in sample]
+    for fmt in dict.fromkeys(guess for guess in guesses if guess is not None):
+        try:
+            pd.to_datetime(sample, format=fmt)
+        except ValueError:
+            continue
+        return fmt
+    raise ExtractorError(f"Cannot detect the datetime format of column {column}")
+
+
+async def parse_with_schema(parse, uri, dtypes: dict = None, cache: SchemaCache = None,
+                            convert=None, offload=None) -> pd.DataFrame:
+    """
+    Parse a resource with explicit dtypes, the dtypes learned in @cache or inferred ones.
+    Learned dtypes that no longer fit the data are forgotten and learned again.
+    Everything after the parse, conversion, casts and learning, runs through @offload
+    so that the event loop never works on the whole DataFrame.
+    @param parse: Function that takes a mapping of dtypes, or None to infer them,
+    and returns the parsed DataFrame or an awaitable of it
+    @param uri: URI of the resource
+    @param dtypes: Explicit dtypes, they take precedence over @cache
+    @param cache: Cache of learned dtypes
+    @param convert: Function applied to the parsed DataFrame before dtypes are learned,
+    e.g. to parse datetime columns
+    @param offload: Function that runs a function with its arguments off the event loop
+    and returns an awaitable of its result, None for the default executor of the loop
+    @returns: Parsed DataFrame
+    """
+    if offload is None:
+        offload = functools.partial(asyncio.get_running_loop().run_in_executor, None)
+
+    async def read(known):
+        df = parse(known)
+        return await df if inspect.isawaitable(df) else df
+
+    def cast(df, known):
+        return apply_dtypes(convert(df) if convert is not None else df, known)
+
+    def learn(df):
+        return cache.learn(uri, convert(df) if convert is not None else df)
+
+    if dtypes is not None:
+        return await offload(cast, await read(dtypes), dtypes)
+    if cache is None:
+        return await offload(cast, await read(None), None)
+    learned = cache.get(uri)
+    df = None
+    if learned:
+        # only the dtype pass may fail on stale dtypes, errors of @convert are raised
+        try:
+            df = await offload(apply_dtypes, await read(learned), learned)
+        except (ValueError, TypeError, OverflowError) as e:
+            get_logger(__name__).warning("Learned dtypes of %s do not fit: %s", uri, e)
+            cache.invalidate(uri)
+    if df is None:
+        df = await read(None)
+    return await offload(learn, df)
@@ -2,6 +2,7 @@
 Module for ILoader interface
 """
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 import pandas as pd
 from sqlalchemy import Table
 
@@ -26,6 +27,18 @@ class ILoader(ABC):
         @param keys: Keys to be used for upserting
         """
 
+    async def upsert_stream(self, chunks: AsyncIterator[pd.DataFrame], table: Table,
+                            keys: dict) -> None:
+        """
+        Method that loads an async stream of DataFrame chunks into a destination,
+        by default every chunk is loaded with upsert
+        @param chunks: Async iterator of the data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to be used for upserting
+        """
+        async for chunk in chunks:
+            await self.upsert(chunk, table, keys)
+
     @abstractmethod
     def __del__(self) -> None:
         """
@@ -0,0 +1,60 @@
+"""
+Module for LoadResult class
+"""
+import pandas as pd
+
+
+class LoadResult:
+    """
+    Class that reports the outcome of a load
+    """
+
+    def __init__(self, processed: int = 0, inserted: int = None, updated: int = None,
+                 skipped: int = 0, rejected: pd.DataFrame = None, collapsed: int = 0):
+        """
+        Constructor for LoadResult
+        @param processed: Number of rows sent to the database
+        @param inserted: Number of inserted rows, None if the load path cannot tell
+        @param updated: Number of updated rows, None if the load path cannot tell
+        @param skipped: Number of rows not written because they did not change
+        @param rejected: Rows refused by the database with row_index and error columns
+        @param collapsed: Number of rows removed because they repeated the keys of other rows
+        @self.processed: Number of rows sent to the database
+        @self.inserted: Number of inserted rows
+        @self.updated: Number of updated rows
+        @self.skipped: Number of unchanged rows that were not written
+        @self.rejected: Rows refused by the database, None if every row was accepted
+        @self.collapsed: Number of duplicate key rows collapsed before the load
+        """
+        self.processed = processed
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped
+        self.rejected = rejected
+        self.collapsed = collapsed
+
+    def __add__(self, other: "LoadResult") -> "LoadResult":
+        """
+        Sum the counters of two loads, a counter stays None if either load cannot tell it
+        @param other: LoadResult to add
+        @returns: New LoadResult
+        """
+        def add(first, second):
+            return None if first is None or second is None else first + second
+        rejected = [frame for frame in (self.rejected, other.rejected) if frame is not None]
+        return LoadResult(processed=self.processed + other.processed,
+                          inserted=add(self.inserted, other.inserted),
+                          updated=add(self.updated, other.updated),
+                          skipped=self.skipped + other.skipped,
+                          rejected=pd.concat(rejected) if rejected else None,
+                          collapsed=self.collapsed + other.collapsed)
+
+    def __repr__(self) -> str:
+        """
+        Representation of LoadResult
+        @returns: String with the counters of the load
+        """
+        return (f"LoadResult(processed={self.processed}, "
+                f"inserted={self.inserted}, updated={self.updated}, skipped={self.skipped}, "
+                f"rejected={0 if self.rejected is None else len(self.rejected)}, "
+                f"collapsed={self.collapsed})")
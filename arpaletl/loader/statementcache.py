@@ -0,0 +1,86 @@
+"""
+Module for StatementCache class
+"""
+import threading
+from collections import OrderedDict
+from sqlalchemy import Table
+
+
+class StatementCache:
+    """
+    Class that keeps the statements and column mappings of UpsertLoader per target table,
+    so that repeated loads only bind parameters. Statements are reused as the same objects,
+    which lets the compiled cache of the SQLAlchemy engine serve them without recompiling.
+    """
+
+    def __init__(self, size: int = 512):
+        """
+        Constructor for StatementCache
+        @param size: Maximum number of statements kept, the least recently used are evicted
+        @self._statements: Statements keyed by kind, table, keys, columns and dialect
+        @self._columns: Columns of a DataFrame that exist in a table
+        @self._lock: Lock that guards the caches across loader threads
+        """
+        self.size = size
+        self._statements = OrderedDict()
+        self._columns = OrderedDict()
+        self._lock = threading.Lock()
+
+    def columns(self, table: Table, columns) -> list:
+        """
+        Get the columns of a DataFrame that exist in @table, keeping the DataFrame order
+        @param table: Target table
+        @param columns: Columns of the DataFrame
+        @returns: List of column names
+        """
+        key = (table, tuple(columns))
+        with self._lock:
+            if key in self._columns:
+                self._columns.move_to_end(key)
+                return list(self._columns[key])
+        names = table.columns.keys()
+        found = [col for col in columns if col in names]
+        self._store(self._columns, key, found)
+        return list(found)
+
+    def statement(self, kind: str, table: Table, keys: list, columns: list, dialect,
+                  build):
+        """
+        Get a cached statement or build and cache it
+        @param kind: Kind of statement, e.g. "merge" or "update"
+        @param table: Target table
+        @param keys: Key columns
+        @param columns: Written columns
+        @param dialect: Dialect of the target database
+        @param build: Function without arguments that builds the statement
+        @returns: Executable statement
+        """
+        key = (kind, table, tuple(keys), tuple(columns), dialect.name)
+        with self._lock:
+            if key in self._statements:
+                self._statements.move_to_end(key)
+                return self._statements[key]
+        stmt = build()
+        self._store(self._statements, key, stmt)
+        return stmt
+
+    def clear(self) -> None:
+        """
+        Empty the cache, e.g. after the DDL of a cached table changed
+        """
+        with self._lock:
+            self._statements.clear()
+            self._columns.clear()
+
+    def _store(self, cache: OrderedDict, key, value) -> None:
+        """
+        Store a value evicting the least recently used entries above @self.size
+        @param cache: Cache to store the value into
+        @param key: Cache key
+        @param value: Value to store
+        """
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.size:
+                cache.popitem(last=False)
@@ -0,0 +1,192 @@
+"""
+Module with the dialect aware statement builders used by UpsertLoader
+"""
+from sqlalchemy import Column, MetaData, Table, bindparam, delete, select, text, true, update
+from sqlalchemy.engine import Dialect
+from sqlalchemy.dialects import postgresql, sqlite
+from arpaletl.utils.arpaletlerrors import LoaderError
+
+
+def merge_statement(table: Table, keys: list, columns: list, dialect: Dialect):
+    """
+    Build a parameterized upsert statement that can be executed with executemany,
+    every parameter set is a dict keyed by column name passed through merge_parameters
+    @param table: Table to upsert into
+    @param keys: Key columns used to match existing rows
+    @param columns: Columns that are written
+    @param dialect: Dialect of the target database
+    @raises LoaderError: If the dialect is not supported or keys are not in columns
+    @returns: Executable statement
+    """
+    _check_keys(keys, columns)
+    if dialect.name == "oracle":
+        # generated bind names, a column name is not always a valid bind name
+        source = ", ".join(f":{_bind_name(position)} AS {dialect.identifier_preparer.quote(col)}"
+                           for position, col in enumerate(columns))
+        return _oracle_merge(table, keys, columns, dialect, f"(SELECT {source} FROM dual)")
+    if dialect.name in ("sqlite", "postgresql"):
+        return _on_conflict(_dialect_insert(table, dialect), keys, columns)
+    raise LoaderError(f"Merge is not supported for dialect {dialect.name}")
+
+
+def merge_parameters(records: list, columns: list, dialect: Dialect) -> list:
+    """
+    Key the parameter sets of merge_statement by its bind names
+    @param records: Parameter sets keyed by column name
+    @param columns: Written columns, in the order given to merge_statement
+    @param dialect: Dialect of the target database
+    @returns: Parameter sets keyed by bind name
+    """
+    if dialect.name != "oracle":
+        return records
+    names = {col: _bind_name(position) for position, col in enumerate(columns)}
+    return [{names[col]: value for col, value in record.items()} for record in records]
+
+
+def select_by_key_statement(table: Table, keys: list):
+    """
+    Build a parameterized select of the key columns of the row matching key_<key> parameters
+    @param table: Table to read
+    @param keys: Key columns
+    @returns: Select statement
+    """
+    return select(*[table.c[key] for key in keys]) \
+        .where(*[table.c[key] == bindparam(f"key_{key}") for key in keys])
+
+
+def update_by_key_statement(table: Table, keys: list, columns: list):
+    """
+    Build a parameterized update of the non key @columns of the row matching
+    key_<key> parameters, every parameter set is a dict keyed by key_<key> and column name
+    @param table: Table to update
+    @param keys: Key columns
+    @param columns: Written columns
+    @returns: Update statement
+    """
+    return update(table) \
+        .where(*[table.c[key] == bindparam(f"key_{key}") for key in keys]) \
+        .values({col: bindparam(col) for col in columns if col not in keys})
+
+
+def staging_table(table: Table, dialect: Dialect, name: str = None) -> Table:
+    """
+    Build a staging table with the same columns of @table and no constraints,
+    it is a global temporary table on Oracle and a temporary table elsewhere
+    @param table: Target table
+    @param dialect: Dialect of the target database
+    @param name: Name of the staging table, defaults to <table>_stg
+    @returns: Staging Table bound to its own MetaData
+    """
+    columns = [Column(col.name, col.type) for col in table.columns]
+    if dialect.name == "oracle":
+        return Table(name or f"{table.name}_stg", MetaData(), *columns,
+                     prefixes=["GLOBAL TEMPORARY"], oracle_on_commit="PRESERVE ROWS")
+    return Table(name or f"{table.name}_stg", MetaData(), *columns, prefixes=["TEMPORARY"])
+
+
+def merge_from_statement(table: Table, staging: Table, keys: list, columns: list,
+                         dialect: Dialect):
+    """
+    Build a single set based statement that merges every row of @staging into @table
+    @param table: Table to upsert into
+    @param staging: Staging table holding the rows to merge
+    @param keys: Key columns used to match existing rows
+    @param columns: Columns that are written
+    @param dialect: Dialect of the target database
+    @raises LoaderError: If the dialect is not supported or keys are not in columns
+    @returns: Executable statement
+    """
+    _check_keys(keys, columns)
+    if dialect.name == "oracle":
+        return _oracle_merge(table, keys, columns, dialect,
+                             dialect.identifier_preparer.format_table(staging))
+    if dialect.name in ("sqlite", "postgresql"):
+        # WHERE true keeps SQLite from parsing ON CONFLICT as a join constraint
+        source = select(*[staging.c[col] for col in columns]).where(true())
+        stmt = _dialect_insert(table, dialect).from_select(columns, source)
+        return _on_conflict(stmt, keys, columns)
+    raise LoaderError(f"Merge is not supported for dialect {dialect.name}")
+
+
+def truncate_statement(staging: Table, dialect: Dialect):
+    """
+    Build the statement that empties a staging table
+    @param staging: Staging table
+    @param dialect: Dialect of the target database
+    @returns: Executable statement
+    """
+    if dialect.name == "oracle":
+        return text(f"TRUNCATE TABLE {dialect.identifier_preparer.format_table(staging)}")
+    return delete(staging)
+
+
+def _check_keys(keys: list, columns: list) -> None:
+    """
+    Check that every key is part of the written columns
+    @param keys: Key columns
+    @param columns: Written columns
+    @raises LoaderError: If a key is missing
+    """
+    missing = [key for key in keys if key not in columns]
+    if not keys or missing:
+        raise LoaderError(f"Invalid upsert keys, missing columns: {missing}")
+
+
+def _bind_name(position: int) -> str:
+    """
+    Get the bind name of the written column at @position
+    @param position: Position of the column
+    @returns: Bind name
+    """
+    return f"p{position}"
+
+
+def _oracle_merge(table: Table, keys: list, columns: list, dialect: Dialect, source: str):
+    """
+    Build an Oracle MERGE INTO ... USING statement
+    @param table: Table to upsert into
+    @param keys: Key columns
+    @param columns: Written columns
+    @param dialect: Oracle dialect
+    @param source: Row source of the merge, a subquery or a table name
+    @returns: TextClause
+    """
+    preparer = dialect.identifier_preparer
+    quoted = {col: preparer.quote(col) for col in columns}
+    condition = " AND ".join(f"t.{quoted[key]} = s.{quoted[key]}" for key in keys)
+    sql = f"MERGE INTO {preparer.format_table(table)} t USING {source} s ON ({condition})"
+    updates = [col for col in columns if col not in keys]
+    if updates:
+        assignments = ", ".join(f"t.{quoted[col]} = s.{quoted[col]}" for col in updates)
+        sql += f" WHEN MATCHED THEN UPDATE SET {assignments}"
+    targets = ", ".join(quoted[col] for col in columns)
+    values = ", ".join(f"s.{quoted[col]}" for col in columns)
+    sql += f" WHEN NOT MATCHED THEN INSERT ({targets}) VALUES ({values})"
+    return text(sql)
+
+
+def _dialect_insert(table: Table, dialect: Dialect):
+    """
+    Build the dialect specific insert construct that supports ON CONFLICT
+    @param table: Table to insert into
+    @param dialect: SQLite or PostgreSQL dialect
+    @returns: Insert statement
+    """
+    if dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def _on_conflict(stmt, keys: list, columns: list):
+    """
+    Add an ON CONFLICT DO UPDATE clause to a SQLite or PostgreSQL insert
+    @param stmt: Dialect specific insert statement
+    @param keys: Key columns, they must be covered by a unique constraint
+    @param columns: Written columns
+    @returns: Insert statement
+    """
+    updates = {col: stmt.excluded[col] for col in columns if col not in keys}
+    if not updates:
+        return stmt.on_conflict_do_nothing(index_elements=keys)
+    return stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+
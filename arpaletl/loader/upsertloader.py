@@ -1,26 +1,63 @@
 """
 Module for UpsertLoader class
 """
+import asyncio
+import functools
+import numbers
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import numpy as np
 import pandas as pd
-from sqlalchemy import Table
-from sqlalchemy import select, update, insert
+from sqlalchemy import Connection, Table
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy import select, insert
 from arpaletl.loader.loader import ILoader
-from arpaletl.utils.arpaletlerrors import LoaderError
+from arpaletl.loader.loadresult import LoadResult
+from arpaletl.loader.statementcache import StatementCache
+from arpaletl.loader.statements import merge_statement, merge_from_statement, merge_parameters
+from arpaletl.loader.statements import select_by_key_statement, update_by_key_statement
+from arpaletl.loader.statements import staging_table, truncate_statement
+from arpaletl.utils.arpaletlerrors import LoaderError, PartitionLoadError
 from arpaletl.utils.logger import get_logger
 
 
+_statement_cache = StatementCache()
+
+
 class UpsertLoader(ILoader):
     """
     Class that loads data into Oracle DB. Implements the ILoader interface.
+    The blocking DB work never runs on the event loop: it runs on the async engine
+    of the client when @use_async_engine is set, otherwise on a thread pool.
     """
 
-    def __init__(self, db_client) -> None:
+    def __init__(self, db_client, executor: Executor = None,
+                 use_async_engine: bool = False,
+                 statement_cache: StatementCache = None, dedup=None) -> None:
         """
         Constructor for OracleDbLoader
         @param db_client: Database client
+        @param executor: Executor that runs the DB work, defaults to a thread pool owned by the loader
+        @param use_async_engine: Run the DB work on db_client.get_async_engine() when available
+        @param statement_cache: Cache of statements and column mappings,
+        defaults to a cache shared by every loader of the process
+        @param dedup: Policy that collapses the rows repeating the same keys before every load,
+        "last" or "first" to keep the last or first row, or a dict of column -> pandas
+        aggregation (missing columns keep the value of the last row), None to load every row
+        @self._staging: Staging tables already derived from target tables
+        @self._owned_executor: Thread pool created by the loader
         """
         self.logger = get_logger(__name__)
         self.db_client = db_client
+        self.executor = executor
+        self.use_async_engine = use_async_engine
+        self.statement_cache = statement_cache or _statement_cache
+        self._staging = {}
+        self._owned_executor = None
+        if dedup is not None and not isinstance(dedup, dict) and dedup not in ("first", "last"):
+            raise LoaderError(f"Invalid dedup policy {dedup}")
+        self.dedup = dedup
 
     async def upsert(self, data: pd.DataFrame, table: Table, keys: dict) -> None:
         """
@@ -30,27 +67,14 @@ class UpsertLoader(ILoader):
         @param keys: Keys to match data with
         """
         try:
-            engine = self.db_client.get_engine()
             self.logger.info("Upserting data into DB")
-            with engine.connect() as connection:
-                for _, row in data.iterrows():
-                    data = row.to_dict()
-                    data = {k: v for k, v in data.items(
-                    ) if k in table.columns.keys()}
-                    conditions = [table.c[col] == data[col] for col in keys]
-                    stmt = select(table).where(*conditions)
-                    result = connection.execute(stmt).fetchone()
-
-                    if result:
-                        stmt = update(table).where(*conditions).values(**data)
-                    else:
-                        stmt = insert(table).values(**data)
-                    connection.execute(stmt)
-                connection.commit()
+            async with self._connect() as run:
+                await run(self._upsert_rows, data, table, keys)
+                await run(Connection.commit)
         except Exception as e:
             raise LoaderError(
                 f"Error loading data into DB: {str(e)}") from e
-            
+
     async def upsert_transaction(self, data: pd.DataFrame, table: Table, keys: dict) -> None:
         """
         Method that loads data into Oracle DB as a single transaction
@@ -59,33 +83,588 @@ class UpsertLoader(ILoader):
         @param keys: Keys to match data with
         """
         try:
-            engine = self.db_client.get_engine()
             self.logger.info("Upserting data into DB")
-            with engine.connect() as connection:
-                # Start transaction
-                with connection.begin():
-                    for _, row in data.iterrows():
-                        data = row.to_dict()
-                        data = {k: v for k, v in data.items() 
-                            if k in table.columns.keys()}
-                        conditions = [table.c[col] == data[col] for col in keys]
-                        stmt = select(table).where(*conditions)
-                        result = connection.execute(stmt).fetchone()
-                        
-                        if result:
-                            stmt = update(table).where(*conditions).values(**data)
+            async with self._connect() as run:
+                # Transaction will automatically commit if no errors occurred
+                # If any error occurred, it will automatically rollback
+                await run(_in_transaction, self._upsert_rows, data, table, keys)
+        except Exception as e:
+            raise LoaderError(
+                f"Error loading data into DB: {str(e)}") from e
+
+    def _upsert_rows(self, connection, data: pd.DataFrame, table: Table, keys: dict) -> None:
+        """
+        Upsert @data row by row on an open connection
+        @param connection: Open connection
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        """
+        data, _ = self._deduplicate(data, keys)
+        columns = self.statement_cache.columns(table, data.columns)
+        values = [col for col in columns if col not in keys]
+        find = self._statement("select", table, keys, columns, connection.dialect,
+                               lambda: select_by_key_statement(table, keys))
+        change = self._statement("update", table, keys, columns, connection.dialect,
+                                 lambda: update_by_key_statement(table, keys, columns))
+        add = self._statement("insert", table, keys, columns, connection.dialect,
+                              lambda: insert(table))
+        for record in _records(data[columns]):
+            params = {f"key_{key}": record[key] for key in keys}
+            if connection.execute(find, params).fetchone():
+                if values:
+                    params.update({col: record[col] for col in values})
+                    connection.execute(change, params)
+            else:
+                connection.execute(add, record)
+
+    async def upsert_merge(self, data: pd.DataFrame, table: Table, keys: list,
+                           batch_size: int = 1000, on_error: str = "raise",
+                           quarantine: Table = None) -> LoadResult:
+        """
+        Method that loads data into the DB with set based merge statements,
+        rows are sent in array bound batches of @batch_size rows as a single transaction.
+        With @on_error "collect" the rows refused by the DB are collected instead of
+        aborting the load: Oracle reports them through the batcherrors of the array DML,
+        other dialects retry row by row only the batches that failed.
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call
+        @param on_error: "raise" to abort the load on the first error, "collect" to load
+        every good row and report the rejected ones
+        @param quarantine: Table the rejected rows are written to, its row_index and error
+        columns, if any, receive the index label of the row in @data and the DB error
+        @raises LoaderError: If the merge fails
+        @returns: LoadResult of the load, with the rejected rows
+        """
+        if on_error not in ("raise", "collect"):
+            raise LoaderError(f"Invalid on_error {on_error}")
+        try:
+            self.logger.info("Merging data into DB")
+            async with self._connect() as run:
+                result = await run(_in_transaction, self._merge, data, table, keys,
+                                   batch_size, on_error, quarantine)
+        except Exception as e:
+            raise LoaderError(
+                f"Error merging data into DB: {str(e)}") from e
+        return result
+
+    def _merge(self, connection, data: pd.DataFrame, table: Table, keys: list,
+               batch_size: int, on_error: str = "raise", quarantine: Table = None) -> LoadResult:
+        """
+        Send @data to the DB as merge batches on an open connection
+        @param connection: Open connection
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call
+        @param on_error: "raise" or "collect"
+        @param quarantine: Table the rejected rows are written to
+        @returns: LoadResult of the load
+        """
+        data, collapsed = self._deduplicate(data, keys)
+        columns = self.statement_cache.columns(table, data.columns)
+        stmt = self._statement("merge", table, keys, columns, connection.dialect,
+                               lambda: merge_statement(table, keys, columns, connection.dialect))
+        errors = []
+        for start in range(0, len(data), batch_size):
+            records = merge_parameters(_records(data[columns].iloc[start:start + batch_size]),
+                                       columns, connection.dialect)
+            if on_error == "raise":
+                connection.execute(stmt, records)
+            else:
+                errors += [(start + offset, message) for offset, message
+                           in _execute_collecting(connection, stmt, records)]
+        result = LoadResult(processed=len(data), collapsed=collapsed)
+        if errors:
+            result.rejected = data.iloc[[offset for offset, _ in errors]].assign(
+                row_index=data.index[[offset for offset, _ in errors]],
+                error=[message for _, message in errors])
+            self.logger.warning("%d rows rejected by %s", len(errors), table.name)
+            if quarantine is not None:
+                quarantined = self.statement_cache.columns(quarantine, result.rejected.columns)
+                connection.execute(insert(quarantine), _records(result.rejected[quarantined]))
+        self.logger.info("Merged %d rows into %s", len(data) - len(errors), table.name)
+        return result
+
+    async def upsert_stream(self, chunks: AsyncIterator[pd.DataFrame], table: Table,
+                            keys: list, strategy: str = "merge", batch_size: int = 1000,
+                            commit_every: int = None, atomic: bool = False) -> LoadResult:
+        """
+        Method that loads an async stream of DataFrame chunks so that memory and undo
+        stay bounded by the chunk size instead of the size of the whole load.
+        By default every chunk is committed on its own, with @commit_every the commit happens
+        as soon as at least @commit_every rows are pending. With @atomic the whole stream is a
+        single transaction and every chunk runs inside its own savepoint.
+        @param chunks: Async iterator of the data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param strategy: Load path of every chunk, "merge" or "indexed"
+        @param batch_size: Number of rows bound to every executemany call
+        @param commit_every: Minimum number of rows between two commits
+        @param atomic: Load all or nothing
+        @raises LoaderError: If the load fails, with @atomic nothing is loaded
+        @returns: LoadResult of all the chunks
+        """
+        strategies = {"merge": self._merge, "indexed": self._upsert_indexed}
+        if strategy not in strategies:
+            raise LoaderError(f"Invalid strategy {strategy}")
+        load = strategies[strategy]
+        # the indexed path counts inserts and updates, a None counter would hide them
+        result = LoadResult(inserted=0, updated=0) if strategy == "indexed" else LoadResult()
+        committed = 0
+        try:
+            self.logger.info("Streaming data into DB")
+            async with self._connect() as run:
+                if atomic:
+                    await run(Connection.begin)
+                try:
+                    async for chunk in chunks:
+                        if atomic:
+                            result += await run(
+                                _in_savepoint, load, chunk, table, keys, batch_size)
                         else:
-                            stmt = insert(table).values(**data)
-                        connection.execute(stmt)
-                    # Transaction will automatically commit here if no errors occurred
-                    # If any error occurred, it will automatically rollback
+                            result += await run(load, chunk, table, keys, batch_size)
+                            if commit_every is None or \
+                                    result.processed - committed >= commit_every:
+                                await run(Connection.commit)
+                                committed = result.processed
+                    await run(Connection.commit)
+                    committed = result.processed
+                except Exception:
+                    await run(Connection.rollback)
+                    raise
+        except Exception as e:
+            raise LoaderError(
+                f"Error streaming data into DB, {committed} rows committed: {str(e)}") from e
+        self.logger.info("Streamed %d rows into %s", result.processed, table.name)
+        return result
+
+    async def upsert_parallel(self, data: pd.DataFrame, table: Table, keys: list,
+                              partitions: int = 4, strategy: str = "merge",
+                              batch_size: int = 1000) -> list:
+        """
+        Method that hash partitions data on @keys and loads the partitions concurrently,
+        every partition on its own pooled connection and transaction. Since rows with the
+        same keys always land in the same partition no two partitions touch the same row.
+        The engine pool should hold at least @partitions connections.
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with, also used as partitioning key
+        @param partitions: Number of partitions loaded concurrently
+        @param strategy: Load path of every partition, "merge" or "indexed"
+        @param batch_size: Number of rows bound to every executemany call
+        @raises PartitionLoadError: If any partition fails, after every partition has finished,
+        with the LoadResult of every committed partition in its results
+        @returns: List with the LoadResult of every partition
+        """
+        strategies = {"merge": self._merge, "indexed": self._upsert_indexed}
+        if strategy not in strategies:
+            raise LoaderError(f"Invalid strategy {strategy}")
+        if partitions < 1:
+            raise LoaderError(f"Invalid number of partitions {partitions}")
+        missing = [key for key in keys if key not in data.columns]
+        if not keys or missing:
+            raise LoaderError(f"Invalid upsert keys, missing columns: {missing}")
+        load = strategies[strategy]
+        codes = pd.util.hash_pandas_object(data[keys], index=False).to_numpy() % partitions
+        self.logger.info("Loading data into DB with %d partitions", partitions)
+
+        async def load_partition(part: pd.DataFrame) -> LoadResult:
+            async with self._connect() as run:
+                return await run(_in_transaction, load, part, table, keys, batch_size)
+        outcomes = await asyncio.gather(
+            *[load_partition(data[codes == part]) for part in range(partitions)],
+            return_exceptions=True)
+
+        errors = {part: outcome for part, outcome in enumerate(outcomes)
+                  if isinstance(outcome, BaseException)}
+        for part, error in errors.items():
+            self.logger.error("Partition %d failed: %s", part, error)
+        if errors:
+            loaded = sum(outcome.processed for outcome in outcomes
+                         if isinstance(outcome, LoadResult))
+            raise PartitionLoadError(
+                f"Error loading {len(errors)} of {partitions} partitions into DB, "
+                f"{loaded} rows committed: "
+                + "; ".join(f"partition {part}: {error}" for part, error in errors.items()),
+                outcomes)
+        return outcomes
+
+    async def upsert_staging(self, data: pd.DataFrame, table: Table, keys: list,
+                             batch_size: int = 10000, staging: Table = None) -> LoadResult:
+        """
+        Method that bulk inserts data into a staging table, merges the staging table
+        into the target table with a single statement and then truncates the staging table.
+        The staging table is a global temporary table on Oracle and it is created if missing.
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call on the staging table
+        @param staging: Staging table, defaults to a <table>_stg copy of @table without constraints
+        @raises LoaderError: If the load fails
+        @returns: LoadResult of the load
+        """
+        try:
+            self.logger.info("Loading data into DB through a staging table")
+            async with self._connect() as run:
+                result = await run(self._merge_staging, data, table, keys, batch_size, staging)
+        except Exception as e:
+            raise LoaderError(
+                f"Error loading data into DB through staging: {str(e)}") from e
+        return result
+
+    def _merge_staging(self, connection, data: pd.DataFrame, table: Table, keys: list,
+                       batch_size: int, staging: Table = None) -> LoadResult:
+        """
+        Load @data through a staging table on an open connection
+        @param connection: Open connection, not in a transaction
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call on the staging table
+        @param staging: Staging table, defaults to a <table>_stg copy of @table
+        @returns: LoadResult of the load
+        """
+        data, collapsed = self._deduplicate(data, keys)
+        dialect = connection.dialect
+        if staging is None:
+            staging = self._staging.get((table, dialect.name))
+            if staging is None:
+                staging = staging_table(table, dialect)
+                self._staging[(table, dialect.name)] = staging
+        columns = self.statement_cache.columns(table, data.columns)
+        stmt = self._statement(
+            f"merge_from:{staging.name}", table, keys, columns, dialect,
+            lambda: merge_from_statement(table, staging, keys, columns, dialect))
+        with connection.begin():
+            staging.create(connection, checkfirst=True)
+        try:
+            with connection.begin():
+                for start in range(0, len(data), batch_size):
+                    connection.execute(
+                        insert(staging),
+                        _records(data[columns].iloc[start:start + batch_size]))
+                connection.execute(stmt)
+        finally:
+            with connection.begin():
+                connection.execute(truncate_statement(staging, dialect))
+        self.logger.info("Merged %d rows into %s from %s", len(data), table.name, staging.name)
+        return LoadResult(processed=len(data), collapsed=collapsed)
+
+    async def upsert_indexed(self, data: pd.DataFrame, table: Table, keys: list,
+                             batch_size: int = 1000, key_range: bool = True,
+                             delta: bool = False, hash_column: str = None) -> LoadResult:
+        """
+        Method that reads the keys of the target table once into an in memory index,
+        splits data into inserts and updates and sends both partitions with executemany
+        as a single transaction.
+        With @delta only new or changed rows are written: a content hash of every row is
+        compared with the stored @hash_column or, without it, with a hash of the current rows.
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call
+        @param key_range: Only read the keys between the min and max of every key in @data
+        @param delta: Skip the rows whose content did not change
+        @param hash_column: Column of @table that stores the content hash of every row
+        @raises LoaderError: If the load fails
+        @returns: LoadResult with inserted, updated and skipped counts
+        """
+        try:
+            self.logger.info("Upserting data into DB with a prefetched key index")
+            async with self._connect() as run:
+                result = await run(_in_transaction, self._upsert_indexed, data, table, keys,
+                                   batch_size, key_range, delta, hash_column)
         except Exception as e:
             raise LoaderError(
                 f"Error loading data into DB: {str(e)}") from e
+        return result
+
+    def _upsert_indexed(self, connection, data: pd.DataFrame, table: Table, keys: list,
+                        batch_size: int, key_range: bool = True, delta: bool = False,
+                        hash_column: str = None) -> LoadResult:
+        """
+        Split @data on the existing keys of @table and write both partitions
+        @param connection: Open connection
+        @param data: Data to be loaded
+        @param table: Table to load data into
+        @param keys: Keys to match data with
+        @param batch_size: Number of rows bound to every executemany call
+        @param key_range: Only read the keys in the range of @data
+        @param delta: Skip the rows whose content did not change
+        @param hash_column: Column of @table that stores the content hash of every row
+        @returns: LoadResult with inserted, updated and skipped counts
+        """
+        data, collapsed = self._deduplicate(data, keys)
+        columns = [col for col in self.statement_cache.columns(table, data.columns)
+                   if col != hash_column]
+        missing = [key for key in keys if key not in columns]
+        if not keys or missing:
+            raise LoaderError(f"Invalid upsert keys, missing columns: {missing}")
+        content = [col for col in columns if col not in keys]
+        if hash_column is not None:
+            data = data.assign(**{hash_column: _row_hash(data[content])})
+            columns.append(hash_column)
+            fetched = [hash_column] if delta else []
+        else:
+            fetched = content if delta else []
+        existing = self._fetch_existing(connection, data, table, keys, fetched, key_range)
+        index = pd.MultiIndex.from_frame(existing[keys])
+        incoming = pd.MultiIndex.from_frame(data[keys])
+        exists = incoming.isin(index)
+        unchanged = np.zeros(len(data), dtype=bool)
+        if delta and len(existing):
+            stored = existing[hash_column] if hash_column is not None \
+                else _row_hash(existing[content])
+            stored = pd.Series(stored.to_numpy(), index=index).reindex(incoming)
+            current = data[hash_column] if hash_column is not None \
+                else _row_hash(data[content])
+            unchanged = exists & (stored.to_numpy() == current.to_numpy())
+        inserts = data.loc[~exists, columns]
+        updates = data.loc[exists & ~unchanged, columns]
+
+        for start in range(0, len(inserts), batch_size):
+            connection.execute(insert(table), _records(inserts.iloc[start:start + batch_size]))
+        values = [col for col in columns if col not in keys]
+        if values and len(updates):
+            stmt = self._statement("update", table, keys, columns, connection.dialect,
+                                   lambda: update_by_key_statement(table, keys, columns))
+            updates = updates.rename(columns={key: f"key_{key}" for key in keys})
+            for start in range(0, len(updates), batch_size):
+                connection.execute(stmt, _records(updates.iloc[start:start + batch_size]))
+        skipped = int(unchanged.sum())
+        self.logger.info("Inserted %d, updated %d and skipped %d rows into %s",
+                         len(inserts), len(updates), skipped, table.name)
+        return LoadResult(processed=len(data), inserted=len(inserts),
+                          updated=len(updates), skipped=skipped, collapsed=collapsed)
+
+    def _fetch_existing(self, connection, data: pd.DataFrame, table: Table, keys: list,
+                        columns: list, key_range: bool) -> pd.DataFrame:
+        """
+        Read the key columns of @table, and optionally more columns, with a single query
+        @param connection: Open connection
+        @param data: Data to be loaded, used to bound the key range
+        @param table: Table to read the keys from
+        @param keys: Key columns
+        @param columns: Other columns to read
+        @param key_range: Only read the keys between the min and max of every key in @data
+        @returns: DataFrame of the existing rows with key columns cast to the dtypes of @data
+        """
+        stmt = select(*[table.c[col] for col in keys + columns])
+        if key_range and len(data):
+            stmt = stmt.where(*[table.c[key].between(_scalar(data[key].min()),
+                                                     _scalar(data[key].max()))
+                                for key in keys if data[key].notna().any()])
+        existing = pd.DataFrame(connection.execute(stmt).fetchall(), columns=keys + columns)
+        return existing.astype(data[keys].dtypes.to_dict())
+
+    def _deduplicate(self, data: pd.DataFrame, keys: list) -> tuple:
+        """
+        Collapse the rows of @data that repeat the same keys with the dedup policy
+        @param data: Data to be loaded
+        @param keys: Keys to match data with
+        @returns: Tuple of the deduplicated data and the number of collapsed rows
+        """
+        if self.dedup is None or not keys or any(key not in data.columns for key in keys):
+            return data, 0
+        if isinstance(self.dedup, dict) and any(col not in keys for col in data.columns):
+            # groupby "last" skips missing values, the last row must win as a whole
+            aggregations = {col: self.dedup.get(col, _last)
+                            for col in data.columns if col not in keys}
+            unique = data.groupby(keys, as_index=False, sort=False, dropna=False) \
+                .agg(aggregations)
+            # every group keeps the label of its last row, rejected rows report it as row_index
+            labels = pd.Series(data.index, index=data.index) \
+                .groupby([data[key] for key in keys], sort=False, dropna=False).agg(_last)
+            unique.index = pd.Index(labels.to_numpy(), name=data.index.name)
+        elif isinstance(self.dedup, dict):
+            unique = data.drop_duplicates(subset=keys, keep="last")
+        else:
+            unique = data.drop_duplicates(subset=keys, keep=self.dedup)
+        collapsed = len(data) - len(unique)
+        if collapsed:
+            self.logger.info("Collapsed %d rows with duplicate keys", collapsed)
+        return unique, collapsed
+
+    def _statement(self, kind: str, table: Table, keys: list, columns: list, dialect, build):
+        """
+        Get a statement from the statement cache, building it on a miss
+        @param kind: Kind of statement
+        @param table: Target table
+        @param keys: Key columns
+        @param columns: Written columns
+        @param dialect: Dialect of the target database
+        @param build: Function without arguments that builds the statement
+        @returns: Executable statement
+        """
+        return self.statement_cache.statement(kind, table, keys, columns, dialect, build)
+
+    @asynccontextmanager
+    async def _connect(self):
+        """
+        Open a connection without blocking the event loop
+        @yields: Coroutine function run(work, *args) that awaits work(connection, *args)
+        executed off the event loop on the opened connection
+        """
+        engine = None
+        if self.use_async_engine and hasattr(self.db_client, "get_async_engine"):
+            try:
+                engine = self.db_client.get_async_engine()
+            except Exception as e:
+                self.logger.warning("Async engine unavailable, using a thread pool: %s", e)
+        if engine is not None:
+            async with engine.connect() as connection:
+                yield connection.run_sync
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        connection = await loop.run_in_executor(executor, self.db_client.get_engine().connect)
+
+        async def run(work, *args):
+            return await loop.run_in_executor(
+                executor, functools.partial(work, connection, *args))
+        try:
+            yield run
+        finally:
+            await loop.run_in_executor(executor, connection.close)
+
+    def _get_executor(self) -> Executor:
+        """
+        Get the executor that runs the DB work, creating the owned thread pool if needed
+        @returns: Executor object
+        """
+        if self.executor is not None:
+            return self.executor
+        if self._owned_executor is None:
+            self._owned_executor = ThreadPoolExecutor(thread_name_prefix="arpaletl-loader")
+        return self._owned_executor
 
     def __del__(self) -> None:
         """
         Destructor for OracleDbLoader
         """
+        if self._owned_executor is not None:
+            self._owned_executor.shutdown(wait=False)
         self.logger.info("Closing DB connection")
         self.db_client.close()
+
+
+def _in_transaction(connection, work, *args):
+    """
+    Run work(connection, *args) inside a transaction
+    @param connection: Open connection
+    @param work: Function to run
+    @returns: Value returned by work
+    """
+    with connection.begin():
+        return work(connection, *args)
+
+
+def _in_savepoint(connection, work, *args):
+    """
+    Run work(connection, *args) inside a savepoint of the current transaction
+    @param connection: Open connection in a transaction
+    @param work: Function to run
+    @returns: Value returned by work
+    """
+    with connection.begin_nested():
+        return work(connection, *args)
+
+
+def _execute_collecting(connection, stmt, records: list) -> list:
+    """
+    Execute @stmt for every record without stopping at the records refused by the DB.
+    Oracle collects the refused records in a single executemany with batch errors, the async
+    driver cannot report them so async connections and the other DBs retry every record
+    of a failed batch in its own savepoint.
+    @param connection: Open connection in a transaction
+    @param stmt: Statement to execute
+    @param records: Parameter sets
+    @returns: List of (offset in @records, error message) of the refused records
+    """
+    if connection.dialect.name == "oracle" and not connection.dialect.is_async:
+        compiled = stmt.compile(dialect=connection.dialect)
+        names = {key: name.strip('"') for key, name in compiled.escaped_bind_names.items()}
+        if names:
+            records = [{names.get(key, key): value for key, value in record.items()}
+                       for record in records]
+        cursor = connection.connection.cursor()
+        try:
+            cursor.executemany(str(compiled), records, batcherrors=True)
+            return [(error.offset, error.message) for error in cursor.getbatcherrors()]
+        finally:
+            cursor.close()
+    try:
+        with connection.begin_nested():
+            connection.execute(stmt, records)
+        return []
+    except DBAPIError:
+        errors = []
+        for offset, record in enumerate(records):
+            try:
+                with connection.begin_nested():
+                    connection.execute(stmt, record)
+            except DBAPIError as e:
+                errors.append((offset, str(e.orig)))
+        return errors
+
+
+def _last(values: pd.Series):
+    """
+    Last value of a group, missing or not
+    @param values: Values of a group
+    @returns: Last value
+    """
+    return values.iloc[-1]
+
+
+def _records(data: pd.DataFrame) -> list:
+    """
+    Convert a DataFrame into executemany parameters, missing values become None
+    @param data: DataFrame to convert
+    @returns: List of dicts keyed by column name
+    """
+    return data.astype(object).where(data.notna(), None).to_dict("records")
+
+
+def _scalar(value):
+    """
+    Convert a numpy scalar into the matching Python object so that every driver can bind it
+    @param value: Value to convert
+    @returns: Python object
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _canonical(value):
+    """
+    Canonical form of a value for the row hash: a number with an integral value is an int,
+    the other numbers are floats, so that 2, 2.0 and Decimal("2") hash the same whether
+    they come from an int, a float, a nullable int held as float or a NUMBER column
+    @param value: Value to normalize
+    @returns: Normalized value
+    """
+    if isinstance(value, (bool, np.bool_)) or not isinstance(value, (numbers.Number, np.number)):
+        return value
+    if isinstance(value, (numbers.Integral, np.integer)):
+        return int(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(value) if number.is_integer() else number
+
+
+def _row_hash(data: pd.DataFrame) -> pd.Series:
+    """
+    Vectorized content hash of every row, values are compared by the string form of their
+    canonical value so that rows read back from the DB hash like the incoming ones
+    @param data: DataFrame to hash
+    @returns: Series of signed 64 bit hashes
+    """
+    normalized = data.astype(object).where(data.notna(), None).map(_canonical).astype(str)
+    hashes = pd.util.hash_pandas_object(normalized, index=False)
+    return pd.Series(hashes.to_numpy().view(np.int64), index=data.index)
@@ -1,9 +1,12 @@
 """
 Module for FsResource class
 """
+import io
+import mmap
 import os
-from typing import AsyncIterator
-from arpaletl.resource.resource import IResource
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO
+from arpaletl.resource.resource import IResource, SPOOL_THRESHOLD
 from arpaletl.utils.arpaletlerrors import ResourceError
 from arpaletl.utils.logger import get_logger
 
@@ -65,3 +68,45 @@ class FsResource(IResource):
         except Exception as e:
             self.logger.error("Error opening file system resource: %s", e)
             raise ResourceError("Error opening file system resource") from e
+
+    @asynccontextmanager
+    async def open_buffer(self, threshold: int = SPOOL_THRESHOLD,
+                          directory: str = None) -> AsyncIterator[BinaryIO]:
+        """
+        Open the whole resource as a seekable buffer, an unzipped file is memory mapped
+        in place without being copied
+        @param threshold: Maximum size in bytes kept in memory for zipped files
+        @param directory: Directory of the temporary file of zipped files
+        @raises: ResourceError: If there are problems opening the resource
+        @returns: Async context manager of a BytesIO or of a read only mmap
+        """
+        if self.zipped:
+            async with super().open_buffer(threshold, directory) as buffer:
+                yield buffer
+            return
+        try:
+            file = open(self.uri, "rb")
+        except OSError as e:
+            self.logger.error("Error opening file system resource: %s", e)
+            raise ResourceError("Error opening file system resource") from e
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                # an empty file cannot be memory mapped
+                yield io.BytesIO()
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    @asynccontextmanager
+    async def spool(self, directory: str = None) -> AsyncIterator[str]:
+        """
+        Get the path of the whole resource, an unzipped file is used in place
+        @param directory: Directory of the temporary file of zipped files
+        @raises: ResourceError: If there are problems opening the resource
+        @returns: Async context manager of the path of the file
+        """
+        if self.zipped:
+            async with super().spool(directory) as path:
+                yield path
+            return
+        yield self.uri
@@ -0,0 +1,170 @@
+"""
+Module for HttpCache class
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from arpaletl.utils.arpaletlerrors import ResourceError
+from arpaletl.utils.logger import get_logger
+
+
+class HttpCache:
+    """
+    Class that keeps the bodies of HTTP responses on disk with their ETag and Last-Modified
+    validators, keyed by URI and request headers. WebResource sends the validators as
+    If-None-Match and If-Modified-Since and reads the body from the cache when the server
+    answers 304 Not Modified. The least recently used bodies are evicted above @max_size.
+    """
+
+    def __init__(self, directory, max_size: int = 512 * 1024 * 1024):
+        """
+        Constructor for HttpCache
+        @param directory: Directory of the cached bodies and of their index, created if missing
+        @param max_size: Maximum total size in bytes of the cached bodies
+        @raises: ResourceError: If the index exists and is not valid
+        @self._entries: Validators and size of every cached body, least recently used first
+        @self._lock: Lock that guards the index across concurrent downloads
+        """
+        self.logger = get_logger(__name__)
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        index = os.path.join(directory, "index.json")
+        if os.path.exists(index):
+            try:
+                with open(index, "r", encoding="utf-8") as file:
+                    self._entries = OrderedDict(json.load(file))
+            except (OSError, ValueError, TypeError) as e:
+                self.logger.error("Error reading HTTP cache index: %s", e)
+                raise ResourceError("Error reading HTTP cache index") from e
+
+    @staticmethod
+    def key(uri: str, headers: dict = None) -> str:
+        """
+        Get the cache key of a request
+        @param uri: URI of the request
+        @param headers: Headers of the request
+        @returns: Hex digest of the URI and the headers
+        """
+        request = json.dumps([uri, sorted((headers or {}).items())])
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def validators(self, key: str) -> dict:
+        """
+        Get the conditional request headers of a cached response
+        @param key: Cache key
+        @returns: If-None-Match and If-Modified-Since headers, empty if nothing is cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def path(self, key: str) -> str:
+        """
+        Get the path of a cached body, marking it as the most recently used
+        @param key: Cache key
+        @returns: Path of the body, None if it is not cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self._save()
+        return self._body(key)
+
+    def read(self, key: str) -> bytes:
+        """
+        Read a cached body, marking it as the most recently used
+        @param key: Cache key
+        @returns: Cached body, None if it is not cached
+        """
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def temporary(self) -> str:
+        """
+        Create an empty file in the cache directory that a body is written to before store_file
+        @returns: Path of the file
+        """
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False) as file:
+            return file.name
+
+    def store(self, key: str, body: bytes, etag: str = None, last_modified: str = None) -> None:
+        """
+        Cache a response body
+        @param key: Cache key
+        @param body: Response body
+        @param etag: ETag header of the response
+        @param last_modified: Last-Modified header of the response
+        """
+        path = self.temporary()
+        with open(path, "wb") as file:
+            file.write(body)
+        self.store_file(key, path, etag, last_modified)
+
+    def store_file(self, key: str, path: str, etag: str = None, last_modified: str = None) -> None:
+        """
+        Cache a response body written to a file from temporary(), the file is moved into the cache.
+        A response without validators cannot be revalidated and is not cached.
+        @param key: Cache key
+        @param path: Path of the body
+        @param etag: ETag header of the response
+        @param last_modified: Last-Modified header of the response
+        """
+        if not etag and not last_modified:
+            os.remove(path)
+            return
+        size = os.path.getsize(path)
+        if size > self.max_size:
+            os.remove(path)
+            self.logger.info("Response of %d bytes is larger than the HTTP cache", size)
+            return
+        with self._lock:
+            os.replace(path, self._body(key))
+            self._entries[key] = {"etag": etag, "last_modified": last_modified, "size": size}
+            self._entries.move_to_end(key)
+            total = sum(entry["size"] for entry in self._entries.values())
+            while total > self.max_size:
+                evicted, entry = self._entries.popitem(last=False)
+                total -= entry["size"]
+                try:
+                    os.remove(self._body(evicted))
+                except OSError:
+                    pass
+                self.logger.info("Evicted %s from the HTTP cache", evicted)
+            self._save()
+
+    def _body(self, key: str) -> str:
+        """
+        Get the path of the body of a key
+        @param key: Cache key
+        @returns: Path of the body
+        """
+        return os.path.join(self.directory, f"{key}.body")
+
+    def _save(self) -> None:
+        """
+        Write the index to a temporary file and move it over the index
+        """
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=self.directory,
+                                         suffix=".tmp", delete=False) as file:
+            json.dump(self._entries, file)
+        os.replace(file.name, os.path.join(self.directory, "index.json"))
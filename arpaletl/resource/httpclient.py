@@ -0,0 +1,96 @@
+"""
+Module for HttpClient class
+"""
+import asyncio
+import aiohttp
+from arpaletl.utils.arpaletlerrors import ResourceError
+from arpaletl.utils.logger import get_logger
+
+
+class HttpClient:
+    """
+    Class that owns an aiohttp session with a pooled connector shared by many WebResources,
+    so that requests to the same host reuse kept alive connections and cached DNS lookups
+    instead of paying for a new TCP and TLS handshake every time.
+    The session is created on first use and bound to the running event loop, so a client
+    serves a single event loop; close it with close() or use it as an async context manager:
+    async with HttpClient(limit_per_host=8) as client:
+        resources = [WebResource(uri, client=client) for uri in uris]
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 8, ttl_dns_cache: int = 300,
+                 keepalive_timeout: float = 30, headers: dict = None):
+        """
+        Constructor for HttpClient
+        @param limit: Maximum number of open connections
+        @param limit_per_host: Maximum number of open connections to the same host
+        @param ttl_dns_cache: Seconds a DNS lookup is cached
+        @param keepalive_timeout: Seconds an idle connection is kept open for reuse
+        @param headers: Headers sent with every request
+        @self._session: Shared session, None until first use
+        @self._loop: Event loop the session is bound to
+        @self._closed: If close() was called
+        """
+        self.logger = get_logger(__name__)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.headers = headers
+        self._session = None
+        self._loop = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        """
+        If the client was closed
+        @returns: True after close()
+        """
+        return self._closed
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared session, creating it on first use in the running event loop
+        @raises: ResourceError: If the client is closed or its session belongs to
+        another event loop
+        @returns: Shared ClientSession
+        """
+        if self._closed:
+            raise ResourceError("HttpClient is closed")
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            # a session cannot be used across event loops, e.g. two asyncio.run calls
+            self.logger.error("HttpClient used from another event loop")
+            raise ResourceError("HttpClient is bound to another event loop")
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host,
+                                             ttl_dns_cache=self.ttl_dns_cache,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the shared session and its pooled connections
+        """
+        self._closed = True
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self.logger.info("HttpClient closed")
+        self._session = None
+
+    async def __aenter__(self) -> "HttpClient":
+        """
+        Enter the async context of the client
+        @returns: The client
+        """
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        """
+        Close the client when leaving its async context
+        """
+        await self.close()
@@ -2,11 +2,19 @@
 Module for IResource interface
 """
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO
 import io
+import mmap
+import os
+import tempfile
 import zipfile
 from arpaletl.utils.arpaletlerrors import ResourceError
 from arpaletl.utils.logger import get_logger
 
+SPOOL_THRESHOLD = 64 * 1024 * 1024
+
+
 class IResource(ABC):
     """
     Interface for resources
@@ -39,6 +47,58 @@ class IResource(ABC):
         @returns: Opened resource that can be parsed in @chunk sized chunks
         """
 
+    @asynccontextmanager
+    async def open_buffer(self, threshold: int = SPOOL_THRESHOLD,
+                          directory: str = None) -> AsyncIterator[BinaryIO]:
+        """
+        Open the whole resource as a seekable buffer without holding large resources in
+        memory: the stream is kept in memory up to @threshold bytes, beyond it is spooled
+        to a temporary file that is memory mapped. The buffer and the temporary file are
+        released when the context exits.
+        @param threshold: Maximum size in bytes kept in memory
+        @param directory: Directory of the temporary file, defaults to the system one
+        @raises: ResourceError: If there are problems opening the resource
+        @returns: Async context manager of a BytesIO or of a read only mmap
+        """
+        memory = io.BytesIO()
+        spool = None
+        try:
+            async for chunk in self.open_stream():
+                if spool is None and memory.tell() + len(chunk) > threshold:
+                    spool = tempfile.NamedTemporaryFile(dir=directory, suffix=".spool")
+                    spool.write(memory.getbuffer())
+                    memory = None
+                    self.logger.info("Spooling %s to %s", self.uri, spool.name)
+                (memory if spool is None else spool).write(chunk)
+            if spool is None:
+                memory.seek(0)
+                yield memory
+                return
+            spool.flush()
+            with mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        finally:
+            if spool is not None:
+                spool.close()
+
+    @asynccontextmanager
+    async def spool(self, directory: str = None) -> AsyncIterator[str]:
+        """
+        Write the whole resource to a temporary file, e.g. for parsers that need a path
+        @param directory: Directory of the temporary file, defaults to the system one
+        @raises: ResourceError: If there are problems opening the resource
+        @returns: Async context manager of the path of the file, removed when the context exits
+        """
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".spool", delete=False) as file:
+            path = file.name
+        try:
+            with open(path, "wb") as file:
+                async for chunk in self.open_stream():
+                    file.write(chunk)
+            yield path
+        finally:
+            os.remove(path)
+
     async def unzip(self, zipblob: bytes) -> bytes:
         """
         This method will unzip a downloaded resource before returning it as an object
@@ -0,0 +1,61 @@
+"""
+Module for RetryPolicy class
+"""
+import asyncio
+import random
+import aiohttp
+
+
+class RetryPolicy:
+    """
+    Class that decides if and when a failed download is tried again. The delay grows
+    exponentially from @backoff up to @max_backoff and is randomized by @jitter,
+    so that many resources failing together do not retry in lockstep.
+    """
+
+    def __init__(self, attempts: int = 3, backoff: float = 0.5, max_backoff: float = 30,
+                 jitter: float = 0.5, statuses: tuple = (408, 429, 500, 502, 503, 504),
+                 resume: bool = True,
+                 methods: tuple = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")):
+        """
+        Constructor for RetryPolicy
+        @param attempts: Maximum number of retries after the first attempt
+        @param backoff: Delay in seconds before the first retry, doubled at every retry
+        @param max_backoff: Maximum delay in seconds
+        @param jitter: Fraction of the delay that is randomized, 0 for fixed delays
+        @param statuses: HTTP statuses worth a retry, other error statuses fail at once
+        @param resume: Resume an interrupted download from the last received byte with a
+        Range request, otherwise download it again and skip the bytes already received
+        @param methods: HTTP methods safe to send again, the idempotent ones by default,
+        requests with other methods fail at once
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = tuple(statuses)
+        self.resume = resume
+        self.methods = frozenset(method.upper() for method in methods)
+
+    def retryable(self, error: Exception, method: str = "GET") -> bool:
+        """
+        Tell if a failed request can be sent again
+        @param error: Error of the failed attempt
+        @param method: HTTP method of the request
+        @returns: True for connection, payload and timeout errors and for @self.statuses
+        of a request whose method is in @self.methods
+        """
+        if method.upper() not in self.methods:
+            return False
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in self.statuses
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    def delay(self, attempt: int) -> float:
+        """
+        Get the delay before a retry
+        @param attempt: Number of the retry, starting from 1
+        @returns: Delay in seconds
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
@@ -1,9 +1,16 @@
 """
 Module for WebResource class
 """
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
 from typing import AsyncIterator
 import aiohttp
+from arpaletl.resource.httpcache import HttpCache
+from arpaletl.resource.httpclient import HttpClient
 from arpaletl.resource.resource import IResource
+from arpaletl.resource.retrypolicy import RetryPolicy
 from arpaletl.utils.arpaletlerrors import ResourceError
 from arpaletl.utils.logger import get_logger
 
@@ -13,21 +20,45 @@ class WebResource(IResource):
     Class that takes care of handling web resources. Implements the IResource interface.
     """
 
-    def __init__(self, uri: str, timeout: int = 10, headers: dict = None, zipped: bool = False, chunk: int = 1024):
+    def __init__(self, uri: str, timeout: int = 10, headers: dict = None, zipped: bool = False, chunk: int = 1024,
+                 client: HttpClient = None, segment_size: int = None, parallelism: int = 4,
+                 cache: HttpCache = None, retry: RetryPolicy = None):
         """
         Constructor for WebResource
+        @param client: Shared HttpClient, without it every request opens its own session
+        @param segment_size: Size in bytes of the segments downloaded in parallel with range
+        requests when the server accepts them, None downloads a single stream
+        @param parallelism: Maximum number of segments downloaded at the same time
+        @param cache: Cache of the responses, a resource that did not change since the last
+        download is read from it after a conditional request, cached downloads use a single
+        stream retried with @retry
+        @param retry: Policy that retries transient failures, an interrupted stream is resumed
+        from the last received byte, without it the first failure raises
         @self.uri: URI of the web resource
         @self.timeout: Timeout for the request
         @self.headers: Headers for the request
         @self.logger: Logger object
         @self.zipped: isZipped parameter
         @self.chunk: Chunk size for the stream
+        @self.client: Shared HttpClient
+        @self.segment_size: Size of the parallel segments
+        @self.parallelism: Maximum number of segments in flight
+        @self.cache: Cache of the responses
+        @self.retry: Retry policy
+        @self.modified: False if the last download was served from @self.cache because the
+        resource did not change, True if it was downloaded, None before the first download
         """
         self.uri = uri
         self.timeout = timeout
         self.headers = headers
         self.zipped = zipped
         self.chunk = chunk
+        self.client = client
+        self.segment_size = segment_size
+        self.parallelism = parallelism
+        self.cache = cache
+        self.retry = retry
+        self.modified = None
         self.logger = get_logger(__name__)
 
     async def open(self) -> bytes:
@@ -38,17 +69,26 @@ class WebResource(IResource):
         @returns: Opened web resource that can be readed
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.uri,
-                                       timeout=self.timeout,
-                                       headers=self.headers) as response:
-                    response.raise_for_status()
+            async with self._session() as session:
+                if self.cache is not None:
+                    data = b"".join([chunk async for chunk in self._cached_stream(session)])
+                    return await self.unzip(data) if self.zipped else data
+                self.modified = True
+                ranges = await self._probe(session)
+                if ranges is not None:
+                    data = b"".join([segment async for segment in
+                                     self._segments(session, *ranges)])
                     self.logger.info(
                         "Resource successfully downloaded from %s", self.uri)
-                    if self.zipped:
-                        return await self.unzip(await response.content.read())
-                    else:
-                        return await response.content.read()
+                    return await self.unzip(data) if self.zipped else data
+                data = b"".join([chunk async for chunk in
+                                 self._stream(session, max(self.chunk, 65536))])
+                self.logger.info(
+                    "Resource successfully downloaded from %s", self.uri)
+                if self.zipped:
+                    return await self.unzip(data)
+                else:
+                    return data
         except aiohttp.ClientError as e:
             self.logger.error("Error downloading web resource: %s", e)
             raise ResourceError("Error downloading web resource") from e
@@ -61,20 +101,288 @@ class WebResource(IResource):
         @returns: an Iterator that can be parsed in @chunk sized chunks
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.uri,
-                                       timeout=self.timeout,
-                                       headers=self.headers) as response:
-                    response.raise_for_status()
-                    self.logger.info(
-                        "Resource successfully downloaded from %s", self.uri)
-                    while True:
-                        data = await response.content.read(self.chunk)
-                        if not data:
-                            break
+            async with self._session() as session:
+                if self.cache is not None:
+                    async for data in self._cached_stream(session):
                         if self.zipped:
                             data = await self.unzip(data)
                         yield data
+                    return
+                self.modified = True
+                ranges = await self._probe(session)
+                if ranges is not None:
+                    async for segment in self._segments(session, *ranges):
+                        for start in range(0, len(segment), self.chunk):
+                            data = segment[start:start + self.chunk]
+                            if self.zipped:
+                                data = await self.unzip(data)
+                            yield data
+                    self.logger.info(
+                        "Resource successfully downloaded from %s", self.uri)
+                    return
+                async for data in self._stream(session, self.chunk):
+                    if self.zipped:
+                        data = await self.unzip(data)
+                    yield data
+                self.logger.info(
+                    "Resource successfully downloaded from %s", self.uri)
+        except aiohttp.ClientError as e:
+            self.logger.error("Error downloading web resource: %s", e)
+            raise ResourceError("Error downloading web resource") from e
+
+    async def is_modified(self) -> bool:
+        """
+        Ask the server with a conditional request if the resource changed since it was
+        last downloaded into the cache, a changed resource is downloaded into the cache
+        so that the next open() reads it from there
+        @raises: ResourceError: If there are problems downloading the resource
+        @returns: False if the cached resource is still current, always True without a cache
+        """
+        if self.cache is None:
+            return True
+        try:
+            async with self._session() as session:
+                async for _ in self._cached_stream(session):
+                    pass
         except aiohttp.ClientError as e:
             self.logger.error("Error downloading web resource: %s", e)
             raise ResourceError("Error downloading web resource") from e
+        return self.modified
+
+    async def _cached_stream(self, session: aiohttp.ClientSession) -> AsyncIterator[bytes]:
+        """
+        Stream the resource with a conditional request, reading the body from @self.cache
+        when the server answers 304 Not Modified and writing it into @self.cache otherwise.
+        The conditional request is retried with @self.retry, an interrupted body is resumed
+        from the last received byte like _stream(). Sets @self.modified.
+        @param session: ClientSession of the download
+        @raises: ResourceError: If the resource changed while its body was resumed
+        @returns: Async iterator of @self.chunk sized chunks of the body
+        """
+        key = self.cache.key(self.uri, self.headers)
+        validators = self.cache.validators(key)
+        attempt = 0
+        while True:
+            headers = {**(self.headers or {}), **validators}
+            received = 0
+            try:
+                async with session.get(self.uri, timeout=self.timeout,
+                                       headers=headers) as response:
+                    if response.status == 304:
+                        path = self.cache.path(key)
+                        if path is None:
+                            # evicted since the validators were read, download it again
+                            validators = {}
+                            continue
+                        self.modified = False
+                        self.logger.info("Resource %s not modified, reading it from cache",
+                                         self.uri)
+                        with open(path, "rb") as file:
+                            while data := file.read(self.chunk):
+                                yield data
+                        return
+                    response.raise_for_status()
+                    self.modified = True
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    part = self.cache.temporary()
+                    try:
+                        with open(part, "wb") as file:
+                            try:
+                                while data := await response.content.read(self.chunk):
+                                    file.write(data)
+                                    received += len(data)
+                                    yield data
+                            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                                if not received:
+                                    raise
+                                await self._backoff(1, e)
+                                async for data in self._stream(session, self.chunk, received,
+                                                               etag or last_modified):
+                                    file.write(data)
+                                    yield data
+                        self.cache.store_file(key, part, etag, last_modified)
+                    finally:
+                        if os.path.exists(part):
+                            os.remove(part)
+                    self.logger.info("Resource successfully downloaded from %s", self.uri)
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if received:
+                    # the resumed body already used its own retries
+                    raise
+                attempt += 1
+                await self._backoff(attempt, e)
+
+    async def _probe(self, session: aiohttp.ClientSession) -> tuple:
+        """
+        Ask the server for the first byte of the resource to know if it can be downloaded
+        in segments, a GET with a Range header works also on servers that refuse HEAD
+        @param session: ClientSession of the download
+        @returns: Tuple of the size and the ETag of the resource, None if it has to be
+        downloaded as a single stream because segments are disabled, the server does not
+        answer with the byte range, its ETag is weak or the resource fits in one segment
+        """
+        if not self.segment_size:
+            return None
+        headers = {**(self.headers or {}), "Range": "bytes=0-0"}
+        try:
+            async with session.get(self.uri, timeout=self.timeout,
+                                   headers=headers) as response:
+                # any other answer, errors included, is left to the single stream download
+                partial = response.status == 206
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                etag = response.headers.get("ETag")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning("Range probe of %s failed: %s", self.uri, e)
+            partial = False
+        size = int(total) if partial and total.isdigit() else None
+        # If-Range needs a strong ETag, a weak one would have every segment answered whole
+        weak = etag is not None and etag.startswith("W/")
+        if size is None or size <= self.segment_size or weak:
+            self.logger.info("Downloading %s as a single stream", self.uri)
+            return None
+        return size, etag
+
+    async def _segments(self, session: aiohttp.ClientSession, size: int,
+                        etag: str = None) -> AsyncIterator[bytes]:
+        """
+        Download the segments of the resource with at most @self.parallelism range requests
+        in flight and yield them in order, so that at most @self.parallelism segments are
+        held in memory
+        @param session: ClientSession of the download
+        @param size: Size of the resource
+        @param etag: ETag of the resource, it makes the server refuse a changed resource
+        @raises: ResourceError: If the server does not answer with the requested range
+        @returns: Async iterator of the segments in order
+        """
+        ranges = iter([(start, min(start + self.segment_size, size) - 1)
+                       for start in range(0, size, self.segment_size)])
+        pending = deque()
+        try:
+            for start, end in ranges:
+                pending.append(asyncio.ensure_future(self._segment(session, start, end, etag)))
+                if len(pending) >= self.parallelism:
+                    break
+            while pending:
+                data = await pending.popleft()
+                following = next(ranges, None)
+                if following is not None:
+                    pending.append(asyncio.ensure_future(
+                        self._segment(session, *following, etag)))
+                yield data
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _segment(self, session: aiohttp.ClientSession, start: int, end: int,
+                       etag: str = None) -> bytes:
+        """
+        Download the bytes from @start to @end included
+        @param session: ClientSession of the download
+        @param start: First byte
+        @param end: Last byte
+        @param etag: ETag of the resource sent as If-Range
+        @raises: ResourceError: If the server does not answer with the requested range
+        @returns: Bytes of the segment
+        """
+        headers = dict(self.headers or {})
+        headers["Range"] = f"bytes={start}-{end}"
+        if etag is not None:
+            headers["If-Range"] = etag
+        attempt = 0
+        while True:
+            try:
+                async with session.get(self.uri, timeout=self.timeout,
+                                       headers=headers) as response:
+                    response.raise_for_status()
+                    data = await response.content.read() if response.status == 206 else b""
+                    if len(data) != end - start + 1:
+                        self.logger.error("Server did not answer with bytes %d-%d of %s",
+                                          start, end, self.uri)
+                        raise ResourceError(
+                            "Resource changed or range refused during the download")
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                attempt += 1
+                await self._backoff(attempt, e)
+
+    async def _stream(self, session: aiohttp.ClientSession, chunk: int, received: int = 0,
+                      validator: str = None) -> AsyncIterator[bytes]:
+        """
+        Stream the resource with a single request, retried with @self.retry. A retry asks
+        for the bytes after the last received one with a Range request, a server that
+        answers with the whole resource has the received bytes skipped instead.
+        @param session: ClientSession of the download
+        @param chunk: Maximum size of the yielded chunks
+        @param received: Number of bytes already received, the stream resumes after them
+        @param validator: ETag or Last-Modified of the response the bytes were received from
+        @raises: ResourceError: If the resource changed between two attempts
+        @returns: Async iterator of the chunks of the body
+        """
+        attempt = 0
+        while True:
+            headers = dict(self.headers or {})
+            if received and self.retry.resume:
+                headers["Range"] = f"bytes={received}-"
+                if validator is not None:
+                    headers["If-Range"] = validator
+            started = received
+            try:
+                async with session.get(self.uri, timeout=self.timeout,
+                                       headers=headers) as response:
+                    response.raise_for_status()
+                    current = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                    if not received:
+                        validator = current
+                    elif current != validator or (
+                            response.status == 206 and not response.headers.get(
+                                "Content-Range", "").startswith(f"bytes {received}-")):
+                        self.logger.error("Resource %s changed during the download", self.uri)
+                        raise ResourceError("Resource changed during the download")
+                    skip = 0 if response.status == 206 else received
+                    while data := await response.content.read(chunk):
+                        if skip:
+                            cut = min(skip, len(data))
+                            skip -= cut
+                            data = data[cut:]
+                            if not data:
+                                continue
+                        received += len(data)
+                        yield data
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # a failure after some progress starts a new series of retries
+                attempt = 1 if received > started else attempt + 1
+                await self._backoff(attempt, e)
+
+    async def _backoff(self, attempt: int, error: Exception) -> None:
+        """
+        Wait before a retry, or raise the error when it is not transient or the retries
+        of @self.retry are exhausted
+        @param attempt: Number of the retry, starting from 1
+        @param error: Error of the failed attempt
+        @raises: Exception: @error if it is not retried
+        """
+        # every request of a WebResource is a GET
+        if self.retry is None or attempt > self.retry.attempts or \
+                not self.retry.retryable(error, "GET"):
+            raise error
+        delay = self.retry.delay(attempt)
+        self.logger.warning("Retry %d of %s in %.2fs after error: %s",
+                            attempt, self.uri, delay, error)
+        await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """
+        Get the session of the shared client, or a session for this request only
+        @raises: ResourceError: If the shared client is closed
+        @returns: Async context manager of the ClientSession
+        """
+        if self.client is not None:
+            yield self.client.session()
+            return
+        async with aiohttp.ClientSession() as session:
+            yield session
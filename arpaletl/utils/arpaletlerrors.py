@@ -38,3 +38,38 @@ class LoaderError(ArpalEtlError):
     """
     Custom exception for loader errors
     """
+
+
+class PartitionLoadError(LoaderError):
+    """
+    Custom exception for partitioned loads with failed partitions, it carries the
+    outcome of every partition so that the committed ones are not lost
+    """
+
+    def __init__(self, message: str, outcomes: list):
+        """
+        Constructor for PartitionLoadError
+        @param message: Error message
+        @param outcomes: LoadResult of every committed partition and exception
+        of every failed one, in partition order
+        """
+        super().__init__(message)
+        self.outcomes = outcomes
+
+    @property
+    def results(self) -> dict:
+        """
+        LoadResults of the committed partitions
+        @returns: Mapping of partition number to LoadResult
+        """
+        return {part: outcome for part, outcome in enumerate(self.outcomes)
+                if not isinstance(outcome, BaseException)}
+
+    @property
+    def failures(self) -> dict:
+        """
+        Errors of the failed partitions
+        @returns: Mapping of partition number to exception
+        """
+        return {part: outcome for part, outcome in enumerate(self.outcomes)
+                if isinstance(outcome, BaseException)}
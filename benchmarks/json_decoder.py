@@ -0,0 +1,69 @@
+"""
+Benchmark of the JSON decoding backends of JSONExtractor on a synthetic sensor payload.
+Run from the repository root with: python -m benchmarks.json_decoder [records]
+"""
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from arpaletl.extractor.jsonextractor import JSONExtractor
+from arpaletl.resource.fsresource import FsResource
+
+
+def sensor_payload(records: int) -> bytes:
+    """
+    Build a list of sensor readings like the ones of the ARPAL feeds
+    @param records: Number of readings
+    @returns: JSON document
+    """
+    return json.dumps([{
+        "station": f"ST{i % 300:03d}",
+        "sensor": random.choice(["TEMP", "RAIN", "WIND", "HUM"]),
+        "time": f"2024-01-{i % 28 + 1:02d}T{i % 24:02d}:00:00Z",
+        "value": round(random.uniform(-10, 40), 2),
+        "valid": i % 17 != 0,
+        "quality": i % 3,
+    } for i in range(records)]).encode()
+
+
+def best_of(extractor: JSONExtractor, repeat: int = 5) -> float:
+    """
+    Time the extraction of a resource
+    @param extractor: Extractor to run
+    @param repeat: Number of runs
+    @returns: Best wall time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        asyncio.run(extractor.extract())
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(records: int) -> None:
+    """
+    Print the extraction time of every decoder
+    @param records: Number of readings of the payload
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "sensors.json"
+        path.write_bytes(sensor_payload(records))
+        print(f"{records} records, {path.stat().st_size / 2 ** 20:.1f} MiB")
+        baseline = None
+        for decoder in ("json", "orjson"):
+            try:
+                extractor = JSONExtractor(FsResource(path, chunk=2 ** 20), decoder=decoder)
+            except Exception as e:
+                print(f"{decoder:<7} unavailable: {e}")
+                continue
+            elapsed = best_of(extractor)
+            baseline = baseline or elapsed
+            print(f"{decoder:<7} {elapsed:.3f}s x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
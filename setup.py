@@ -6,11 +6,14 @@ setup(
     version="0.1.0-rc1",
     description="ARPAL ETL library",
     install_requires=[    
-        'sqlalchemy',
+        'sqlalchemy[asyncio]',
         'oracledb',
         'pytest',
         'coverage',
         'pandas',
         'aiohttp'
     ],
+    extras_require={
+        'fast': ['orjson', 'pyarrow'],
+    },
 )
@@ -1,5 +1,7 @@
 import unittest
 import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 from arpaletl.extractor.csvextractor import CsvExtractor
@@ -51,3 +53,113 @@ class TestCSVExtractor(unittest.TestCase):
                     resource=case["resource"],
                     expected_exception=case["expected_exception"]
                 )
+
+    def test_csv_extract_stream(self):
+        """
+        Test that extract_stream yields chunks that add up to the extracted DataFrame
+        """
+        current_dir = Path(__file__).parent
+        test_csv = current_dir / 'blobs' / 'test_csv'
+
+        async def collect(extractor, chunksize):
+            return [chunk async for chunk in extractor.extract_stream(chunksize)]
+
+        expected = asyncio.run(CsvExtractor(FsResource(test_csv)).extract())
+        chunks = asyncio.run(collect(CsvExtractor(FsResource(test_csv, chunk=16)), 2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+    def test_csv_extract_stream_quoted_newlines(self):
+        """
+        Test that records with quoted newlines straddling stream chunks are kept whole
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'quoted.csv'
+            path.write_bytes(b'id,"note\nlong"\n1,"a\nb"\n2,"c ""d""\ne"\n3,f\n')
+
+            async def collect():
+                extractor = CsvExtractor(FsResource(path, chunk=3))
+                return [chunk async for chunk in extractor.extract_stream(1)]
+            chunks = asyncio.run(collect())
+
+        self.assertEqual(len(chunks), 3)
+        frame = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(list(frame.columns), ['id', 'note\nlong'])
+        self.assertEqual(list(frame['note\nlong']), ['a\nb', 'c "d"\ne', 'f'])
+
+    def test_csv_extract_stream_header_only(self):
+        """
+        Test that a CSV without records streams a single empty DataFrame with its columns
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'header.csv'
+            path.write_bytes(b'id,name\n')
+
+            async def collect():
+                extractor = CsvExtractor(FsResource(path, chunk=3))
+                return [chunk async for chunk in extractor.extract_stream(2)]
+            chunks = asyncio.run(collect())
+
+        self.assertEqual(len(chunks), 1)
+        self.assertTrue(chunks[0].empty)
+        self.assertEqual(list(chunks[0].columns), ['id', 'name'])
+
+    def test_csv_read_options(self):
+        """
+        Test that the parser engine and dtype backend are passed to the parser
+        """
+        current_dir = Path(__file__).parent
+        test_csv = current_dir / 'blobs' / 'test_csv'
+
+        extractor = CsvExtractor(FsResource(test_csv), engine="python",
+                                 dtype_backend="numpy_nullable")
+        df = asyncio.run(extractor.extract())
+
+        self.assertEqual(len(df), 5)
+        self.assertEqual(str(df[' Age'].dtype), "Int64")
+
+    def test_csv_extract_parallel(self):
+        """
+        Test that parsing byte ranges in parallel gives the same DataFrame as extract
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'large.csv'
+            rows = [f'{i},station {i % 7},{i * 0.5}' for i in range(1000)]
+            path.write_text('id,station,value\n' + '\n'.join(rows) + '\n')
+
+            expected = asyncio.run(CsvExtractor(FsResource(path)).extract())
+            for workers in (1, 3, 2000):
+                with self.subTest(msg=f"{workers} workers"):
+                    extractor = CsvExtractor(FsResource(path))
+                    executor = ThreadPoolExecutor(max_workers=4)
+                    df = asyncio.run(extractor.extract_parallel(workers, executor))
+                    executor.shutdown()
+                    pd.testing.assert_frame_equal(df, expected)
+
+            df = asyncio.run(CsvExtractor(FsResource(path)).extract_parallel(2))
+            pd.testing.assert_frame_equal(df, expected)
+
+    def test_csv_extract_parallel_not_spooled(self):
+        """
+        Test that extract_parallel raises an ExtractorError when the resource cannot be spooled
+        """
+        current_dir = Path(__file__).parent
+        test_csv = current_dir / 'blobs' / 'test_csv'
+
+        extractor = CsvExtractor(FsResource(test_csv, zipped=True))
+        with self.assertRaises(ExtractorError):
+            asyncio.run(extractor.extract_parallel(2))
+
+    def test_csv_extract_executor(self):
+        """
+        Test that parsing in a worker process gives the same DataFrame as the default executor
+        """
+        current_dir = Path(__file__).parent
+        test_csv = current_dir / 'blobs' / 'test_csv'
+
+        expected = asyncio.run(CsvExtractor(FsResource(test_csv)).extract())
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            df = asyncio.run(CsvExtractor(FsResource(test_csv), executor=executor).extract())
+
+        pd.testing.assert_frame_equal(df, expected)
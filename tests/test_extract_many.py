@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+import pandas as pd
+from arpaletl.extractor.csvextractor import CsvExtractor
+from arpaletl.extractor.extractmany import extract_many
+from arpaletl.utils.arpaletlerrors import ExtractorError
+from arpaletl.resource.fsresource import FsResource
+
+
+class SlowResource(FsResource):
+    """
+    File system resource that waits before streaming, like a slow download
+    """
+
+    def __init__(self, uri, delay: float):
+        """
+        Constructor for SlowResource
+        """
+        super().__init__(uri)
+        self.delay = delay
+
+    @asynccontextmanager
+    async def open_buffer(self, *args):
+        """
+        Open the buffer of the file after @self.delay seconds
+        """
+        await asyncio.sleep(self.delay)
+        async with super().open_buffer(*args) as buffer:
+            yield buffer
+
+
+class TestExtractMany(unittest.TestCase):
+    """
+    Test class for extract_many
+    """
+
+    def setUp(self):
+        """
+        Create a temporary directory with a CSV per station
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(6):
+            path = Path(self.tmpdir.name) / f'station_{i}.csv'
+            path.write_text(f"station,value\nS{i},{i}\n")
+            self.paths.append(path)
+
+    def tearDown(self):
+        """
+        Remove the temporary directory
+        """
+        self.tmpdir.cleanup()
+
+    def test_completion_order_and_limit(self):
+        """
+        Test that results are yielded as they complete and that the extractions overlap
+        up to the limit
+        """
+        delays = [0.3, 0.1, 0.2, 0.1, 0.3, 0.2]
+        resources = [SlowResource(path, delay) for path, delay in zip(self.paths, delays)]
+
+        async def collect():
+            return [(resource, df) async for resource, df in
+                    extract_many(resources, CsvExtractor, limit=3)]
+
+        start = time.perf_counter()
+        results = asyncio.run(collect())
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual([resource.delay for resource, _ in results[:2]], [0.1, 0.2])
+        for resource, df in results:
+            self.assertEqual(df["station"].iloc[0], f"S{self.paths.index(resource.uri)}")
+        self.assertLess(elapsed, sum(delays) * 0.8)
+
+    def test_exceptions(self):
+        """
+        Test that a failed extraction raises unless exceptions are returned
+        """
+        Path(self.paths[2]).write_bytes(b'"a,b\n1,2\n')
+        resources = [FsResource(path) for path in self.paths]
+
+        async def collect(return_exceptions):
+            extractor = partial(CsvExtractor, engine="c")
+            return [result async for result in
+                    extract_many(resources, extractor, 2, return_exceptions)]
+
+        results = asyncio.run(collect(True))
+        failed = [resource for resource, df in results if isinstance(df, Exception)]
+        self.assertEqual(failed, [resources[2]])
+        self.assertTrue(all(isinstance(df, pd.DataFrame) for resource, df in results
+                            if resource is not resources[2]))
+        with self.assertRaises(ExtractorError):
+            asyncio.run(collect(False))
@@ -0,0 +1,100 @@
+import unittest
+import pandas as pd
+from arpaletl.extractor.flatten import FlattenSpec
+from arpaletl.utils.arpaletlerrors import ExtractorError
+
+
+class TestFlattenSpec(unittest.TestCase):
+    """
+    Test class for FlattenSpec
+    """
+
+    def setUp(self):
+        """
+        Nested station -> sensors -> measurements records
+        """
+        self.stations = [
+            {
+                "station_id": "GE01",
+                "location": {"lat": 44.4, "lon": 8.9},
+                "sensors": [
+                    {"code": "TEMP", "unit": "C", "measurements": [
+                        {"time": "2024-01-01T00:00", "value": 7.5, "flags": ["ok", "raw"]},
+                        {"time": "2024-01-01T01:00", "value": 7.1, "flags": ["ok"]},
+                    ]},
+                    {"code": "RAIN", "unit": "mm", "measurements": []},
+                ],
+            },
+            {
+                "station_id": "SP02",
+                "location": {"lat": 44.1, "lon": 9.8},
+                "sensors": [
+                    {"code": "TEMP", "unit": "C", "measurements": [
+                        {"time": "2024-01-01T00:00", "value": 9.0, "flags": []},
+                    ]},
+                ],
+            },
+        ]
+
+    def test_record_path_and_meta(self):
+        """
+        Test that the records of the last level get the meta fields of the parent levels
+        """
+        spec = FlattenSpec(record_path=["sensors", "measurements"],
+                           meta=["station_id", "location.lat", ["sensors", "code"]],
+                           dtypes={"station_id": "category"})
+
+        df = spec.apply(self.stations)
+
+        self.assertEqual(list(df.columns),
+                         ["time", "value", "flags", "station_id", "location.lat", "sensors.code"])
+        self.assertEqual(list(df["station_id"]), ["GE01", "GE01", "SP02"])
+        self.assertEqual(list(df["sensors.code"]), ["TEMP", "TEMP", "TEMP"])
+        self.assertEqual(str(df["station_id"].dtype), "category")
+        self.assertEqual(str(df["value"].dtype), "float64")
+
+    def test_explode(self):
+        """
+        Test that explode columns get one row per element
+        """
+        spec = FlattenSpec(record_path=["sensors", "measurements"], meta=["station_id"],
+                           explode=["flags"])
+
+        df = spec.apply(self.stations)
+
+        self.assertEqual(list(df["flags"].fillna("")), ["ok", "raw", "ok", ""])
+
+    def test_nested_objects_without_record_path(self):
+        """
+        Test that nested objects become columns named by their path
+        """
+        df = FlattenSpec(sep="_").apply(self.stations)
+
+        self.assertEqual(list(df.columns), ["station_id", "location_lat", "location_lon", "sensors"])
+        pd.testing.assert_series_equal(df["location_lat"], pd.Series([44.4, 44.1],
+                                                                     name="location_lat"))
+
+    def test_missing_path(self):
+        """
+        Test that a record path or meta field missing from the data raises ExtractorError
+        """
+        for spec in (FlattenSpec(record_path=["probes"]),
+                     FlattenSpec(record_path=["sensors"], meta=["name"])):
+            with self.subTest(msg=str(spec.record_path)):
+                with self.assertRaises(ExtractorError):
+                    spec.apply(self.stations)
+
+    def test_conflicting_names(self):
+        """
+        Test that a parent field named like a record field raises an ExtractorError
+        unless the parent fields get a prefix
+        """
+        data = [{"id": 1, "sensors": [{"id": "a"}, {"id": "b"}]}]
+
+        with self.assertRaisesRegex(ExtractorError, "meta_prefix"):
+            FlattenSpec(record_path=["sensors"]).apply(data)
+        df = FlattenSpec(record_path=["sensors"], meta_prefix="station.").apply(data)
+
+        self.assertEqual(list(df.columns), ["id", "station.id"])
+        self.assertEqual(list(df["id"]), ["a", "b"])
+        self.assertEqual(list(df["station.id"]), [1, 1])
@@ -1,6 +1,10 @@
 import unittest
 import asyncio
+import io
+import mmap
 import os
+import tempfile
+import zipfile
 from pathlib import Path
 from arpaletl.utils.arpaletlerrors import ResourceError
 from arpaletl.resource.fsresource import FsResource
@@ -73,3 +77,33 @@ class TestFsResource(unittest.TestCase):
         # Use asyncio.run() to run the coroutine
         asyncio.run(run_test())
         os.chmod(test_permissions, 0o600)
+
+    def test_fs_resource_open_buffer(self):
+        """
+        Test that open_buffer maps unzipped files in place and unzips zipped ones,
+        spooling them to a file above the threshold
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'data.csv'
+            path.write_bytes(b"a,b\n1,2\n" * 100)
+            archive = Path(tmpdir) / 'data.zip'
+            with zipfile.ZipFile(archive, "w") as zip_ref:
+                zip_ref.write(path, "data.csv")
+            empty = Path(tmpdir) / 'empty.csv'
+            empty.write_bytes(b"")
+
+            async def read(resource, threshold):
+                async with resource.open_buffer(threshold, tmpdir) as buffer:
+                    spooled = [name for name in os.listdir(tmpdir) if name.endswith(".spool")]
+                    return type(buffer), buffer.read(), spooled
+
+            for resource, threshold, kind, spooled in [
+                    (FsResource(path), 10, mmap.mmap, 0),
+                    (FsResource(archive, zipped=True, chunk=10_000), 10_000, io.BytesIO, 0),
+                    (FsResource(archive, zipped=True, chunk=10_000), 10, mmap.mmap, 1)]:
+                with self.subTest(msg=f"{resource.uri} {threshold}"):
+                    result = asyncio.run(read(resource, threshold))
+                    self.assertEqual(result[:2], (kind, path.read_bytes()))
+                    self.assertEqual(len(result[2]), spooled)
+            self.assertEqual(asyncio.run(read(FsResource(empty), 10))[1], b"")
+            self.assertFalse([name for name in os.listdir(tmpdir) if name.endswith(".spool")])
@@ -0,0 +1,138 @@
+import unittest
+import asyncio
+import tempfile
+from pathlib import Path
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from arpaletl.resource.httpcache import HttpCache
+from arpaletl.resource.webresource import WebResource
+from arpaletl.utils.arpaletlerrors import ResourceError
+
+
+class TestHttpCache(unittest.TestCase):
+    """
+    Test class for HttpCache and the conditional requests of WebResource
+    """
+
+    def setUp(self):
+        """
+        Create the cache directory and the versioned body served by the test server
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmpdir.name)
+        self.version = 1
+        self.sent = []
+
+        async def etag(request):
+            tag = f'"v{self.version}"'
+            if request.headers.get("If-None-Match") == tag:
+                self.sent.append(304)
+                return web.Response(status=304, headers={"ETag": tag})
+            self.sent.append(200)
+            return web.Response(body=f"station,value\nGE01,{self.version}\n".encode(),
+                                headers={"ETag": tag})
+
+        async def modified(request):
+            stamp = "Mon, 01 Jan 2024 00:00:00 GMT"
+            if request.headers.get("If-Modified-Since") == stamp:
+                self.sent.append(304)
+                return web.Response(status=304)
+            self.sent.append(200)
+            return web.Response(body=b"a,b\n1,2\n", headers={"Last-Modified": stamp})
+
+        async def uncacheable(request):
+            self.sent.append(200)
+            return web.Response(body=b"a,b\n1,2\n")
+
+        self.routes = {"/etag": etag, "/modified": modified, "/uncacheable": uncacheable}
+
+    def tearDown(self):
+        """
+        Remove the temporary directory
+        """
+        self.tmpdir.cleanup()
+
+    def run_server(self, test):
+        """
+        Helper method that runs a coroutine function with the URL builder of a test server
+        """
+        app = web.Application()
+        for route, handler in self.routes.items():
+            app.router.add_get(route, handler)
+
+        async def run_test():
+            async with TestServer(app) as server:
+                return await test(lambda path: str(server.make_url(path)))
+
+        return asyncio.run(run_test())
+
+    def test_conditional_requests(self):
+        """
+        Test that unchanged resources are served from cache and flagged as not modified
+        """
+        cache = HttpCache(self.dir / 'cache')
+
+        async def test(url):
+            results = []
+            for _ in range(2):
+                resource = WebResource(url("/etag"), cache=cache)
+                results.append((await resource.open(), resource.modified))
+            self.version = 2
+            resource = WebResource(url("/etag"), cache=cache, chunk=4)
+            data = b"".join([chunk async for chunk in resource.open_stream()])
+            results.append((data, resource.modified))
+            results.append((None, await WebResource(url("/etag"), cache=cache).is_modified()))
+            return results
+
+        results = self.run_server(test)
+
+        self.assertEqual(results, [(b"station,value\nGE01,1\n", True),
+                                   (b"station,value\nGE01,1\n", False),
+                                   (b"station,value\nGE01,2\n", True),
+                                   (None, False)])
+        self.assertEqual(self.sent, [200, 304, 200, 304])
+
+    def test_validators(self):
+        """
+        Test that Last-Modified is revalidated and responses without validators are not cached
+        """
+        cache = HttpCache(self.dir / 'cache')
+
+        async def test(url):
+            flags = []
+            for path in ("/modified", "/modified", "/uncacheable", "/uncacheable"):
+                resource = WebResource(url(path), cache=cache)
+                await resource.open()
+                flags.append(resource.modified)
+            return flags
+
+        self.assertEqual(self.run_server(test), [True, False, True, True])
+        self.assertEqual(self.sent, [200, 304, 200, 200])
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used bodies are evicted above the size limit
+        and that the index survives a new cache on the same directory
+        """
+        cache = HttpCache(self.dir / 'cache', max_size=10)
+        keys = [HttpCache.key(f"http://host/{i}", {"Accept": "text/csv"}) for i in range(3)]
+        cache.store(keys[0], b"1234", etag='"a"')
+        cache.store(keys[1], b"5678", etag='"b"')
+        cache.read(keys[0])
+        cache.store(keys[2], b"90ab", etag='"c"')
+
+        reopened = HttpCache(self.dir / 'cache', max_size=10)
+        self.assertEqual(reopened.read(keys[0]), b"1234")
+        self.assertIsNone(reopened.read(keys[1]))
+        self.assertEqual(reopened.validators(keys[2]), {"If-None-Match": '"c"'})
+        self.assertNotEqual(keys[0], HttpCache.key("http://host/0"))
+        self.assertEqual(len(list((self.dir / 'cache').glob("*.body"))), 2)
+
+    def test_invalid_index(self):
+        """
+        Test that an index that is not valid JSON raises a ResourceError
+        """
+        (self.dir / 'cache').mkdir()
+        (self.dir / 'cache' / 'index.json').write_text("[")
+        with self.assertRaises(ResourceError):
+            HttpCache(self.dir / 'cache')
@@ -0,0 +1,82 @@
+import unittest
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from arpaletl.resource.httpclient import HttpClient
+from arpaletl.resource.webresource import WebResource
+from arpaletl.utils.arpaletlerrors import ResourceError
+
+
+class TestHttpClient(unittest.TestCase):
+    """
+    Test class for HttpClient with a local aiohttp server
+    """
+
+    def setUp(self):
+        """
+        Build the application that records the connection of every request
+        """
+        self.connections = []
+
+        async def handler(request):
+            self.connections.append(id(request.transport))
+            return web.Response(body=f"station,value\nS{len(self.connections)},1\n".encode())
+
+        self.app = web.Application()
+        self.app.router.add_get("/{name}", handler)
+
+    def test_shared_connections(self):
+        """
+        Test that WebResources sharing a client reuse kept alive connections
+        while the default ones open a connection per request
+        """
+        async def run_test():
+            async with TestServer(self.app) as server:
+                async with HttpClient(limit_per_host=1) as client:
+                    for i in range(4):
+                        resource = WebResource(str(server.make_url(f"/s{i}")), client=client)
+                        data = await resource.open()
+                        self.assertTrue(data.startswith(b"station,value"))
+                    chunks = [chunk async for chunk in
+                              WebResource(str(server.make_url("/s4")), client=client).open_stream()]
+                    self.assertTrue(b"".join(chunks).endswith(b",1\n"))
+                self.assertTrue(client.closed)
+                for i in range(2):
+                    await WebResource(str(server.make_url(f"/d{i}"))).open()
+
+        asyncio.run(run_test())
+
+        self.assertEqual(len(set(self.connections[:5])), 1)
+        self.assertEqual(len(set(self.connections[5:])), 2)
+
+    def test_closed_client(self):
+        """
+        Test that a closed client refuses new requests
+        """
+        async def run_test():
+            client = HttpClient()
+            await client.close()
+            with self.assertRaises(ResourceError):
+                await WebResource("http://localhost/closed", client=client).open()
+
+        asyncio.run(run_test())
+
+    def test_other_event_loop(self):
+        """
+        Test that a client refuses requests from an event loop other than its own
+        """
+        client = HttpClient()
+
+        async def request(app):
+            async with TestServer(app) as server:
+                return await WebResource(str(server.make_url("/s")), client=client).open()
+
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertTrue(loop.run_until_complete(request(self.app)).startswith(b"station"))
+            self.setUp()
+            with self.assertRaises(ResourceError):
+                asyncio.run(request(self.app))
+        finally:
+            loop.run_until_complete(client.close())
+            loop.close()
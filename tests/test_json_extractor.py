@@ -1,8 +1,16 @@
 import unittest
 import asyncio
+import gzip
+import json
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from unittest import mock
 import pandas as pd
 from arpaletl.extractor.jsonextractor import JSONExtractor
+from arpaletl.extractor.flatten import FlattenSpec
+from arpaletl.extractor.jsonstream import JSONStreamParser
 from arpaletl.utils.arpaletlerrors import ExtractorError
 from arpaletl.resource.webresource import WebResource
 from arpaletl.resource.fsresource import FsResource
@@ -73,3 +81,208 @@ class TestJSONExtractor(unittest.TestCase):
                     expected_exception=case["expected_exception"],
                     gzip_flag=case["gzip_flag"]
                 )
+
+    def test_json_extract_stream(self):
+        """
+        Test that extract_stream yields batches of records for every supported layout
+        """
+        records = [{"id": i, "value": i * 1.5, "name": f"station \"{i}\""} for i in range(7)]
+        expected = pd.DataFrame(records)
+        test_cases = [
+            {
+                "payload": json.dumps(records),
+                "options": {},
+                "description": "Top level array",
+            },
+            {
+                "payload": json.dumps({"meta": {"items": [1, 2], "count": 7},
+                                       "data": {"total": 7, "items": records}}),
+                "options": {"record_path": "data.items"},
+                "description": "Array at record path",
+            },
+            {
+                "payload": "\n".join(json.dumps(record) for record in records),
+                "options": {"ndjson": True},
+                "description": "Newline delimited JSON",
+            },
+        ]
+
+        async def collect(resource, options):
+            extractor = JSONExtractor(resource)
+            return [batch async for batch in extractor.extract_stream(3, **options)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for case in test_cases:
+                with self.subTest(msg=case["description"]):
+                    path = Path(tmpdir) / 'payload.json'
+                    path.write_text(case["payload"])
+                    batches = asyncio.run(collect(FsResource(path, chunk=5), case["options"]))
+
+                    self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+                    pd.testing.assert_frame_equal(
+                        pd.concat(batches, ignore_index=True), expected)
+
+    def test_json_extract_stream_off_event_loop(self):
+        """
+        Test that extract_stream decodes the records on the executor of the extractor
+        """
+        threads = set()
+        feed = JSONStreamParser.feed
+
+        def record_feed(parser, text):
+            threads.add(threading.current_thread().name)
+            return feed(parser, text)
+
+        async def collect(resource, executor):
+            extractor = JSONExtractor(resource, executor=executor)
+            return [batch async for batch in extractor.extract_stream(2)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'payload.json'
+            path.write_text(json.dumps([{"id": i} for i in range(5)]))
+            with ThreadPoolExecutor(thread_name_prefix="extractor") as executor, \
+                    mock.patch.object(JSONStreamParser, "feed", record_feed):
+                batches = asyncio.run(collect(FsResource(path, chunk=8), executor))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("extractor") for name in threads))
+
+    def test_json_extract_stream_invalid(self):
+        """
+        Test that extract_stream raises an ExtractorError on truncated or misplaced arrays
+        """
+        async def collect(resource, options):
+            extractor = JSONExtractor(resource)
+            return [batch async for batch in extractor.extract_stream(3, **options)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'payload.json'
+            for payload, options in [('[{"id": 1}, {"id"', {}),
+                                     ('{"data": []}', {"record_path": "items"}),
+                                     ('{"data": []}', {})]:
+                with self.subTest(msg=payload):
+                    path.write_text(payload)
+                    with self.assertRaises(ExtractorError):
+                        asyncio.run(collect(FsResource(path, chunk=4), options))
+
+    def test_json_stream_parser_pieces(self):
+        """
+        Test that a record split across many pieces is decoded once when it is complete
+        and that skipped values with brackets and escapes inside strings are scanned right
+        """
+        record = {"id": 1, "note": "a \\\"[quoted]\\\" {note}\\",
+                  "values": [[i, {"v": str(i)}] for i in range(500)]}
+        payload = json.dumps({"meta": {"note": "]}\\\"", "list": [1, [2, {"x": "}"}]]},
+                              "count": 12, "data": [record, 2.5, "x", True]})
+        parser = JSONStreamParser(record_path="data")
+        raw_decode = parser.decoder.raw_decode
+        decoded = []
+        records = []
+
+        def record_decode(*args):
+            value, end = raw_decode(*args)
+            decoded.append(value)
+            return value, end
+
+        with mock.patch.object(parser.decoder, "raw_decode", record_decode):
+            for start in range(0, len(payload), 7):
+                records += parser.feed(payload[start:start + 7])
+            records += parser.close()
+
+        self.assertEqual(records, [record, 2.5, "x", True])
+        self.assertEqual(decoded.count(record), 1)
+        self.assertNotIn(12, decoded)
+
+    def test_json_extract_stream_gzipped(self):
+        """
+        Test that gzipped payloads are decompressed on the fly, also with several members
+        """
+        current_dir = Path(__file__).parent
+        json_tmp_gzip = current_dir / 'blobs' / 'json_tmp.gz'
+        expected = asyncio.run(JSONExtractor(FsResource(json_tmp_gzip)).extract(True))
+        records = expected.to_json(orient="records").encode()
+        half = len(records) // 2
+
+        async def collect(resource):
+            extractor = JSONExtractor(resource)
+            return [batch async for batch in extractor.extract_stream(10, gzipped=True)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'members.json.gz'
+            path.write_bytes(gzip.compress(records[:half]) + gzip.compress(records[half:]))
+            batches = asyncio.run(collect(FsResource(path, chunk=7)))
+            pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), expected)
+
+            path.write_bytes(gzip.compress(records)[:-20])
+            with self.assertRaises(ExtractorError):
+                asyncio.run(JSONExtractor(FsResource(path)).extract(True))
+
+    def test_json_decoders(self):
+        """
+        Test that every decoder backend gives the same DataFrame and unknown ones fail
+        """
+        current_dir = Path(__file__).parent
+        json_tmp_gzip = current_dir / 'blobs' / 'json_tmp.gz'
+
+        frames = [asyncio.run(JSONExtractor(FsResource(json_tmp_gzip), decoder=decoder)
+                              .extract(True)) for decoder in ("json", "auto")]
+
+        pd.testing.assert_frame_equal(frames[0], frames[1])
+        with self.assertRaises(ExtractorError):
+            JSONExtractor(FsResource(json_tmp_gzip), decoder="simdjson")
+
+    def test_json_decoders_non_finite(self):
+        """
+        Test that NaN and Infinity decode with every decoder backend, the default one included
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'readings.json'
+            path.write_text('[{"id": 123456789012345678901, "value": NaN}, '
+                            '{"id": 2, "value": Infinity}]')
+            frames = {decoder: asyncio.run(JSONExtractor(FsResource(path), decoder=decoder)
+                                           .extract()) for decoder in ("json", "auto")}
+            default = asyncio.run(JSONExtractor(FsResource(path)).extract())
+
+        for decoder, df in frames.items():
+            with self.subTest(msg=decoder):
+                self.assertTrue(pd.isna(df["value"].iloc[0]))
+                self.assertEqual(df["value"].iloc[1], float("inf"))
+        self.assertEqual(default["id"].iloc[0], 123456789012345678901)
+
+    def test_json_flatten(self):
+        """
+        Test that extract and extract_stream flatten nested records with a FlattenSpec
+        """
+        stations = [{"station_id": f"S{i}", "location": {"lat": 44.0 + i},
+                     "sensors": [{"code": "TEMP", "value": 7.5 + i},
+                                 {"code": "RAIN", "value": float(i)}]} for i in range(3)]
+        spec = FlattenSpec(record_path=["sensors"], meta=["station_id", "location.lat"])
+
+        async def collect(resource):
+            extractor = JSONExtractor(resource, flatten=spec)
+            return [batch async for batch in extractor.extract_stream(2)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / 'stations.json'
+            path.write_text(json.dumps(stations))
+            df = asyncio.run(JSONExtractor(FsResource(path), flatten=spec).extract())
+            batches = asyncio.run(collect(FsResource(path, chunk=16)))
+
+        self.assertEqual(list(df.columns), ["code", "value", "station_id", "location.lat"])
+        self.assertEqual(len(df), 6)
+        pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), df)
+
+    def test_json_extract_executor(self):
+        """
+        Test that decoding in a worker process gives the same DataFrame as the default executor
+        """
+        current_dir = Path(__file__).parent
+        json_tmp_gzip = current_dir / 'blobs' / 'json_tmp.gz'
+
+        expected = asyncio.run(JSONExtractor(FsResource(json_tmp_gzip)).extract(True))
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            df = asyncio.run(JSONExtractor(FsResource(json_tmp_gzip), executor=executor)
+                             .extract(True))
+
+        pd.testing.assert_frame_equal(df, expected)
@@ -1,6 +1,8 @@
 import unittest
+import asyncio
 from unittest.mock import patch, MagicMock
 from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from arpaletl.dbclient.oracledbclient import OracleDbClient
 from arpaletl.utils.arpaletlerrors import DbClientError
 
@@ -42,3 +44,21 @@ class TestOracleDbClient(unittest.TestCase):
         db = OracleDbClient("test_user", "test_password", "test_dsn")
         with self.assertRaises(DbClientError):
             db.connect()
+
+    def test_oracle_db_client_get_async_engine(self):
+        """
+        Test that the async engine is created once with the oracledb async driver
+        """
+        db = OracleDbClient("test_user", "test_password", "test_dsn")
+        engine = db.get_async_engine()
+        self.assertIsInstance(engine, AsyncEngine)
+        self.assertEqual(engine.url.drivername, "oracle+oracledb_async")
+        self.assertIs(db.get_async_engine(), engine)
+
+    def test_oracle_db_client_connect_async_failure(self):
+        """
+        Test the connect_async method of OracleDbClient with invalid credentials
+        """
+        db = OracleDbClient("test_user", "test_password", "test_dsn")
+        with self.assertRaises(DbClientError):
+            asyncio.run(db.connect_async())
@@ -0,0 +1,241 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from pathlib import Path
+import pandas as pd
+from arpaletl.extractor.csvextractor import CsvExtractor
+from arpaletl.extractor.jsonextractor import JSONExtractor
+from arpaletl.extractor.schema import SchemaCache, compact_dtypes, parse_datetimes
+from arpaletl.utils.arpaletlerrors import ExtractorError
+from arpaletl.resource.fsresource import FsResource
+
+
+class TestSchemaCache(unittest.TestCase):
+    """
+    Test class for SchemaCache and the compact dtypes of the extractors
+    """
+
+    def setUp(self):
+        """
+        Create a temporary directory with a CSV of readings
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmpdir.name)
+        self.csv = self.dir / 'readings.csv'
+        rows = [f"{('GE01', 'SP02')[i % 2]},{i},{i * 0.5},note {i}" for i in range(10)]
+        self.csv.write_text("station,count,value,note\n" + "\n".join(rows) + "\n")
+
+    def tearDown(self):
+        """
+        Remove the temporary directory
+        """
+        self.tmpdir.cleanup()
+
+    def test_compact_dtypes(self):
+        """
+        Test that compact dtypes are chosen per kind of column
+        """
+        df = pd.DataFrame({"code": ["A", "B", "A", "A"], "name": ["w", "x", "y", "z"],
+                           "small": [1, 2, 3, 4], "big": [1, 2, 3, 2 ** 40],
+                           "value": [0.5, 1.5, None, 2.0], "items": [[1], [2], [], []],
+                           "id": [20240101123.0, None, 20240101124.0, 1.0],
+                           "lat": [44.1, 44.4, 9.8, None]})
+
+        self.assertEqual(compact_dtypes(df), {"code": "category", "name": "str",
+                                              "small": "int32", "big": "int64",
+                                              "value": "float32", "id": "float64",
+                                              "lat": "float64"})
+
+    def test_csv_learn_and_reuse(self):
+        """
+        Test that the first extraction learns and persists the dtypes and the next
+        extractions, also with a new cache on the same file, parse with them
+        """
+        path = self.dir / 'schema.json'
+        df = asyncio.run(CsvExtractor(FsResource(self.csv),
+                                      schema_cache=SchemaCache(path)).extract())
+
+        expected = {"station": "category", "count": "int32", "value": "float32", "note": "str"}
+        self.assertEqual(json.loads(path.read_text())["dtypes"], {str(self.csv): expected})
+        self.assertEqual({col: str(dtype) for col, dtype in df.dtypes.items()}, expected)
+
+        again = asyncio.run(CsvExtractor(FsResource(self.csv),
+                                         schema_cache=SchemaCache(path)).extract())
+        pd.testing.assert_frame_equal(again, df)
+
+        async def collect():
+            extractor = CsvExtractor(FsResource(self.csv, chunk=16), schema_cache=SchemaCache(path))
+            return [chunk async for chunk in extractor.extract_stream(4)]
+
+        pd.testing.assert_frame_equal(pd.concat(asyncio.run(collect()), ignore_index=True), df)
+
+    def test_csv_relearn(self):
+        """
+        Test that learned dtypes that no longer fit the data are learned again
+        while explicit dtypes that do not fit raise an ExtractorError
+        """
+        cache = SchemaCache(self.dir / 'schema.json')
+        asyncio.run(CsvExtractor(FsResource(self.csv), schema_cache=cache).extract())
+        self.csv.write_text("station,count,value,note\nGE01,,1.0,a\nGE01,3,2.0,b\n")
+
+        df = asyncio.run(CsvExtractor(FsResource(self.csv), schema_cache=cache).extract())
+
+        self.assertEqual(str(df["count"].dtype), "float32")
+        self.assertEqual(cache.get(self.csv)["count"], "float32")
+        with self.assertRaises(ExtractorError):
+            asyncio.run(CsvExtractor(FsResource(self.csv), dtypes={"count": "int32"}).extract())
+
+    def test_json_schema(self):
+        """
+        Test that JSONExtractor applies explicit and learned dtypes
+        """
+        path = self.dir / 'readings.json'
+        path.write_text(json.dumps([{"station": "GE01", "value": i * 1.5} for i in range(4)]))
+        cache = SchemaCache(self.dir / 'schema.json')
+
+        learned = asyncio.run(JSONExtractor(FsResource(path), schema_cache=cache).extract())
+        explicit = asyncio.run(JSONExtractor(FsResource(path),
+                                             dtypes={"value": "float64"}).extract())
+
+        self.assertEqual(str(learned["station"].dtype), "category")
+        self.assertEqual(str(learned["value"].dtype), "float32")
+        self.assertEqual(str(explicit["value"].dtype), "float64")
+        self.assertEqual(cache.get(path), {"station": "category", "value": "float32"})
+
+    def test_invalid_schema_file(self):
+        """
+        Test that a schema file that is not valid JSON raises an ExtractorError
+        """
+        path = self.dir / 'schema.json'
+        path.write_text("{")
+        with self.assertRaises(ExtractorError):
+            SchemaCache(path)
+
+    def test_datetimes(self):
+        """
+        Test that datetime columns are parsed with a detected format that is cached
+        with the schema and detected again when the feed changes format
+        """
+        path = self.dir / 'times.csv'
+        path.write_text("station,time\nGE01,2024-03-31 01:00\nGE01,2024-03-31 03:00\n")
+        cache = SchemaCache(self.dir / 'schema.json')
+
+        df = asyncio.run(CsvExtractor(FsResource(path), schema_cache=cache,
+                                      datetimes=["time"], tz="Europe/Rome").extract())
+
+        self.assertEqual(str(df["time"].dt.tz), "Europe/Rome")
+        self.assertEqual(df["time"].iloc[1], pd.Timestamp("2024-03-31 03:00", tz="Europe/Rome"))
+        self.assertEqual(SchemaCache(self.dir / 'schema.json').formats(path),
+                         {"time": "%Y-%m-%d %H:%M"})
+
+        path.write_text("station,time\nGE01,31/03/2024 01:00:00\n")
+        df = asyncio.run(CsvExtractor(FsResource(path), schema_cache=cache,
+                                      datetimes={"time": None}).extract())
+
+        self.assertEqual(df["time"].iloc[0], pd.Timestamp("2024-03-31 01:00"))
+        self.assertEqual(cache.formats(path), {"time": "%d/%m/%Y %H:%M:%S"})
+        for datetimes in ({"time": "%Y-%m-%d"}, ["date"]):
+            with self.subTest(msg=str(datetimes)):
+                with self.assertRaises(ExtractorError):
+                    asyncio.run(CsvExtractor(FsResource(path), datetimes=datetimes).extract())
+
+    def test_learn_saves_only_new_dtypes(self):
+        """
+        Test that columns without a compact dtype do not rewrite the schema file every run
+        """
+        path = self.dir / 'times.csv'
+        path.write_text("station,time\nGE01,2024-03-31 01:00\nGE01,2024-03-31 03:00\n")
+        cache = SchemaCache(self.dir / 'schema.json')
+        extractor = CsvExtractor(FsResource(path), schema_cache=cache, datetimes=["time"])
+        asyncio.run(extractor.extract())
+
+        with mock.patch.object(cache, "_save", wraps=cache._save) as save:
+            asyncio.run(extractor.extract())
+
+        self.assertEqual(save.call_count, 0)
+        self.assertEqual(cache.get(path), {"station": "category"})
+
+    def test_datetime_detection_options(self):
+        """
+        Test that datetime formats are detected from a sample of the column, day first
+        on request, and that DST gaps and repeats are localized with the given options
+        """
+        path = self.dir / 'days.csv'
+        path.write_text("time\n01/02/2024 02:30\n25/02/2024 02:30\n")
+        df = asyncio.run(CsvExtractor(FsResource(path), datetimes=["time"]).extract())
+
+        self.assertEqual(df["time"].iloc[0], pd.Timestamp("2024-02-01 02:30"))
+
+        path.write_text("time\n01/02/2024 02:30\n31/03/2024 02:30\n")
+        extractor = CsvExtractor(FsResource(path), datetimes=["time"], dayfirst=True,
+                                 tz="Europe/Rome", nonexistent="NaT")
+        df = asyncio.run(extractor.extract())
+
+        self.assertEqual(df["time"].iloc[0], pd.Timestamp("2024-02-01 02:30", tz="Europe/Rome"))
+        self.assertTrue(pd.isna(df["time"].iloc[1]))
+        with self.assertRaises(ExtractorError):
+            asyncio.run(CsvExtractor(FsResource(path), datetimes=["time"],
+                                     tz="Europe/Rome").extract())
+
+    def test_convert_errors_keep_schema(self):
+        """
+        Test that a datetime error with learned dtypes is raised without forgetting them
+        """
+        cache = SchemaCache(self.dir / 'schema.json')
+        asyncio.run(CsvExtractor(FsResource(self.csv), schema_cache=cache).extract())
+
+        with self.assertRaises(ExtractorError):
+            asyncio.run(CsvExtractor(FsResource(self.csv), schema_cache=cache,
+                                     datetimes={"note": "%Y-%m-%d"}).extract())
+
+        self.assertIsNotNone(cache.get(self.csv))
+
+    def test_pipeline_off_event_loop(self):
+        """
+        Test that datetime parsing and dtype learning run on the executor of the extractor
+        """
+        path = self.dir / 'times.csv'
+        path.write_text("station,time\nGE01,2024-03-31 01:00\nGE01,2024-03-31 03:00\n")
+        threads = []
+
+        def record_thread(func):
+            def run(*args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return func(*args, **kwargs)
+            return run
+
+        with ThreadPoolExecutor(thread_name_prefix="extractor") as executor, \
+                mock.patch.object(SchemaCache, "learn", record_thread(SchemaCache.learn)), \
+                mock.patch("arpaletl.extractor.csvextractor.parse_datetimes",
+                           record_thread(parse_datetimes)):
+            cache = SchemaCache(self.dir / 'schema.json')
+            df = asyncio.run(CsvExtractor(FsResource(path), schema_cache=cache,
+                                          datetimes=["time"], executor=executor).extract())
+
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["time"]))
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith("extractor") for name in threads))
+
+    def test_json_stream_datetimes(self):
+        """
+        Test that every batch of extract_stream gets its datetime columns parsed
+        """
+        path = self.dir / 'readings.json'
+        path.write_text(json.dumps([{"time": f"2024-01-01T{i:02d}:00:00Z", "value": i}
+                                    for i in range(5)]))
+
+        async def collect():
+            extractor = JSONExtractor(FsResource(path, chunk=16), datetimes=["time"],
+                                      tz="Europe/Rome")
+            batches = [batch async for batch in extractor.extract_stream(2)]
+            return batches, extractor
+
+        batches, extractor = asyncio.run(collect())
+
+        times = pd.concat(batches, ignore_index=True)["time"]
+        self.assertEqual(times.iloc[4], pd.Timestamp("2024-01-01 05:00", tz="Europe/Rome"))
+        self.assertEqual(extractor._formats, {"time": "%Y-%m-%dT%H:%M:%S%z"})
@@ -0,0 +1,68 @@
+import unittest
+from sqlalchemy import Table, Column, Integer, String, MetaData, insert
+from sqlalchemy.dialects import oracle, sqlite
+from arpaletl.loader.statementcache import StatementCache
+
+
+class TestStatementCache(unittest.TestCase):
+    """
+    Test class for StatementCache
+    """
+
+    def setUp(self):
+        """
+        Create test table
+        """
+        self.test_table = Table(
+            'test_employees',
+            MetaData(),
+            Column('id', Integer, primary_key=True),
+            Column('name', String(100))
+        )
+
+    def test_statement_built_once(self):
+        """
+        Test that a statement is built once per table, keys, columns and dialect
+        """
+        cache = StatementCache()
+        builds = []
+
+        def build():
+            builds.append(1)
+            return insert(self.test_table)
+
+        first = cache.statement("insert", self.test_table, ['id'], ['id', 'name'],
+                                sqlite.dialect(), build)
+        second = cache.statement("insert", self.test_table, ['id'], ['id', 'name'],
+                                 sqlite.dialect(), build)
+        cache.statement("insert", self.test_table, ['id'], ['id', 'name'],
+                        oracle.dialect(), build)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(builds), 2)
+
+    def test_columns_intersection(self):
+        """
+        Test that columns keeps the DataFrame order and drops unknown columns
+        """
+        cache = StatementCache()
+
+        self.assertEqual(cache.columns(self.test_table, ['name', 'extra', 'id']), ['name', 'id'])
+        self.assertEqual(cache.columns(self.test_table, ['name', 'extra', 'id']), ['name', 'id'])
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used statement is evicted above the size
+        """
+        cache = StatementCache(size=1)
+        builds = []
+
+        def build():
+            builds.append(1)
+            return insert(self.test_table)
+
+        cache.statement("insert", self.test_table, ['id'], ['id'], sqlite.dialect(), build)
+        cache.statement("insert", self.test_table, ['id'], ['name'], sqlite.dialect(), build)
+        cache.statement("insert", self.test_table, ['id'], ['id'], sqlite.dialect(), build)
+
+        self.assertEqual(len(builds), 3)
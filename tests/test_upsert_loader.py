@@ -1,11 +1,19 @@
 import unittest
+import importlib.util
 import os
 import asyncio
+import gc
+import tempfile
+import threading
+from unittest import mock
 import pandas as pd
-from sqlalchemy import create_engine, Table, Column, Integer, String, MetaData
-from sqlalchemy import or_
-from arpaletl.utils.arpaletlerrors import LoaderError
-from arpaletl.loader.upsertloader import UpsertLoader
+from sqlalchemy import create_engine, Table, Column, Integer, Float, String, MetaData
+from sqlalchemy import or_, select, event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects import oracle
+from arpaletl.utils.arpaletlerrors import LoaderError, PartitionLoadError
+from arpaletl.loader.upsertloader import UpsertLoader, _execute_collecting, _in_transaction
+from arpaletl.loader.statements import merge_statement, merge_parameters
 
 
 class TestUpsertLoader(unittest.TestCase):
@@ -176,3 +184,567 @@ class TestUpsertLoader(unittest.TestCase):
 
         with self.assertRaises(LoaderError):
             asyncio.run(self.async_upsert(invalid_data, keys, True))
+
+
+class TestUpsertLoaderSqlite(unittest.TestCase):
+    """
+    Test class for the bulk paths of UpsertLoader on a local SQLite database.
+    """
+
+    def setUp(self):
+        """
+        Set up a SQLite database file and create test table
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.tmpdir.name, 'test.db')}")
+        self.metadata = MetaData()
+
+        self.test_table = Table(
+            'test_employees',
+            self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('name', String(100)),
+            Column('department', String(100)),
+            Column('salary', Integer)
+        )
+
+        # let SQLAlchemy emit BEGIN so that pysqlite savepoints behave,
+        # IMMEDIATE serializes the concurrent writers of the parallel tests
+        @event.listens_for(self.engine, "connect")
+        def do_connect(dbapi_connection, _):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(self.engine, "begin")
+        def do_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self.metadata.create_all(self.engine)
+
+        class MockDBClient:
+            """
+            Mock database client to simulate database operations.
+            """
+
+            def __init__(self, engine):
+                """
+                Constructor to set the engine.
+                """
+                self._engine = engine
+
+            def get_engine(self):
+                """
+                Return the engine.
+                """
+                return self._engine
+
+            def close(self):
+                """
+                Dispose the engine.
+                """
+                self._engine.dispose()
+        self.db_client = MockDBClient(self.engine)
+        self.loader = UpsertLoader(self.db_client)
+
+    def tearDown(self):
+        """
+        Remove the SQLite database
+        """
+        del self.loader
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def table_frame(self):
+        """
+        Helper method that reads the test table into a DataFrame sorted by id
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(self.test_table.select()).fetchall()
+        return pd.DataFrame(rows, columns=['id', 'name', 'department', 'salary']) \
+            .sort_values('id').reset_index(drop=True)
+
+    def test_upsert_row_by_row(self):
+        """
+        Test that upsert inserts and updates rows with the cached statements
+        """
+        initial_data = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['John Doe', 'Jane Smith'],
+            'department': ['IT', 'HR'],
+            'salary': [75000, 65000]
+        })
+
+        mixed_data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Wilson', 'Bob Brown'],
+            'department': ['Engineering', 'HR', 'Marketing'],
+            'salary': [85000, 70000, 60000]
+        })
+
+        asyncio.run(self.loader.upsert(initial_data, self.test_table, ['id']))
+        asyncio.run(self.loader.upsert_transaction(mixed_data, self.test_table, ['id']))
+
+        pd.testing.assert_frame_equal(mixed_data, self.table_frame())
+
+    def test_merge_mixed_insert_update(self):
+        """
+        Test that upsert_merge inserts new rows and updates existing ones in batches
+        """
+        initial_data = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['John Doe', 'Jane Smith'],
+            'department': ['IT', 'HR'],
+            'salary': [75000, 65000]
+        })
+
+        mixed_data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Wilson', 'Bob Brown'],
+            'department': ['Engineering', 'HR', 'Marketing'],
+            'salary': [85000, 70000, 60000]
+        })
+
+        asyncio.run(self.loader.upsert_merge(initial_data, self.test_table, ['id']))
+        result = asyncio.run(self.loader.upsert_merge(
+            mixed_data, self.test_table, ['id'], batch_size=2))
+
+        self.assertEqual(result.processed, 3)
+        pd.testing.assert_frame_equal(mixed_data, self.table_frame())
+
+    def test_merge_invalid_keys(self):
+        """
+        Test that upsert_merge raises a LoaderError when keys are not columns
+        """
+        data = pd.DataFrame({'id': [1], 'name': ['John Doe']})
+
+        with self.assertRaises(LoaderError):
+            asyncio.run(self.loader.upsert_merge(data, self.test_table, ['missing']))
+
+    def test_merge_collect_errors(self):
+        """
+        Test that upsert_merge loads the good rows and quarantines the rejected ones
+        """
+        quarantine = Table(
+            'test_quarantine',
+            self.metadata,
+            Column('id', String(100)),
+            Column('name', String(100)),
+            Column('row_index', Integer),
+            Column('error', String(500))
+        )
+        self.metadata.create_all(self.engine)
+        data = pd.DataFrame({
+            'id': [1, 'bad', 3, 4],
+            'name': ['John Doe', 'Jane Smith', 'Bob Brown', 'Ann Lee']
+        })
+
+        result = asyncio.run(self.loader.upsert_merge(
+            data, self.test_table, ['id'], batch_size=2,
+            on_error="collect", quarantine=quarantine))
+
+        self.assertEqual(list(result.rejected['row_index']), [1])
+        self.assertEqual(list(self.table_frame()['id']), [1, 3, 4])
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(quarantine)).fetchall()
+        self.assertEqual([(row[0], row[2]) for row in rows], [('bad', 1)])
+
+    def test_dedup_policies(self):
+        """
+        Test that the dedup policies collapse the rows with duplicate keys before loading
+        """
+        data = pd.DataFrame({
+            'id': [1, 2, 1, 1],
+            'name': ['John Doe', 'Jane Smith', 'John Dee', 'John Doe Jr'],
+            'salary': [100, 200, 300, 400]
+        })
+        cases = [
+            ("last", ['John Doe Jr', 'Jane Smith'], [400, 200]),
+            ("first", ['John Doe', 'Jane Smith'], [100, 200]),
+            ({'salary': 'max'}, ['John Doe Jr', 'Jane Smith'], [400, 200]),
+        ]
+
+        for policy, names, salaries in cases:
+            with self.subTest(msg=str(policy)):
+                loader = UpsertLoader(self.db_client, dedup=policy)
+                result = asyncio.run(loader.upsert_staging(data, self.test_table, ['id']))
+                frame = self.table_frame()
+
+                self.assertEqual(result.collapsed, 2)
+                self.assertEqual(list(frame['name']), names)
+                self.assertEqual(list(frame['salary']), salaries)
+
+    def test_dedup_keeps_last_row(self):
+        """
+        Test that a dict dedup policy keeps the missing values of the last row
+        and collapses frames made only of key columns
+        """
+        data = pd.DataFrame({
+            'id': [1, 1, 2],
+            'name': ['John Doe', None, 'Jane Smith'],
+            'salary': [100, 300, 200]
+        })
+        loader = UpsertLoader(self.db_client, dedup={'salary': 'sum'})
+
+        unique, collapsed = loader._deduplicate(data, ['id'])
+        keys, keys_collapsed = loader._deduplicate(data[['id']], ['id'])
+
+        self.assertEqual(collapsed, 1)
+        self.assertTrue(pd.isna(unique['name'].iloc[0]))
+        self.assertEqual(list(unique['salary']), [400, 200])
+        self.assertEqual(keys_collapsed, 1)
+        self.assertEqual(list(keys['id']), [1, 2])
+
+    def test_dedup_keeps_index_labels(self):
+        """
+        Test that a dict dedup policy keeps the original index labels in the rejected rows
+        """
+        data = pd.DataFrame({'id': [1, 1, 'bad'], 'name': ['John Doe', 'John Dee', 'Jane'],
+                             'salary': [100, 300, 200]}, index=[10, 11, 12])
+        loader = UpsertLoader(self.db_client, dedup={'salary': 'max'})
+
+        result = asyncio.run(loader.upsert_merge(data, self.test_table, ['id'],
+                                                 on_error="collect"))
+
+        self.assertEqual(result.collapsed, 1)
+        self.assertEqual(list(result.rejected['row_index']), [12])
+        self.assertEqual(list(self.table_frame()['name']), ['John Dee'])
+
+    def test_invalid_dedup_policy(self):
+        """
+        Test that an invalid dedup policy raises a LoaderError and the half built
+        loader is collected without errors
+        """
+        unraisable = []
+        with mock.patch("sys.unraisablehook", unraisable.append):
+            with self.assertRaises(LoaderError):
+                UpsertLoader(self.db_client, dedup="max")
+            gc.collect()
+
+        self.assertEqual(unraisable, [])
+
+    def test_staging_mixed_insert_update(self):
+        """
+        Test that upsert_staging merges through an emptied staging table
+        """
+        initial_data = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['John Doe', 'Jane Smith'],
+            'department': ['IT', 'HR'],
+            'salary': [75000, 65000]
+        })
+
+        mixed_data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Wilson', 'Bob Brown'],
+            'department': ['Engineering', 'HR', 'Marketing'],
+            'salary': [85000, 70000, 60000]
+        })
+
+        asyncio.run(self.loader.upsert_staging(initial_data, self.test_table, ['id']))
+        result = asyncio.run(self.loader.upsert_staging(
+            mixed_data, self.test_table, ['id'], batch_size=2))
+
+        self.assertEqual(result.processed, 3)
+        pd.testing.assert_frame_equal(mixed_data, self.table_frame())
+
+    def test_indexed_mixed_insert_update(self):
+        """
+        Test that upsert_indexed splits data into inserts and updates and counts them
+        """
+        initial_data = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['John Doe', 'Jane Smith'],
+            'department': ['IT', 'HR'],
+            'salary': [75000, 65000]
+        })
+
+        mixed_data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Wilson', 'Bob Brown'],
+            'department': ['Engineering', 'HR', 'Marketing'],
+            'salary': [85000, 70000, 60000]
+        })
+
+        first = asyncio.run(self.loader.upsert_indexed(initial_data, self.test_table, ['id']))
+        result = asyncio.run(self.loader.upsert_indexed(
+            mixed_data, self.test_table, ['id'], batch_size=1))
+
+        self.assertEqual((first.inserted, first.updated), (2, 0))
+        self.assertEqual((result.inserted, result.updated), (1, 2))
+        pd.testing.assert_frame_equal(mixed_data, self.table_frame())
+
+    def test_indexed_delta_skips_unchanged(self):
+        """
+        Test that the delta mode only writes new or changed rows
+        """
+        initial_data = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['John Doe', 'Jane Smith'],
+            'department': ['IT', None],
+            'salary': [75000, 65000]
+        })
+
+        mixed_data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Wilson', 'Bob Brown'],
+            'department': ['IT', None, 'Marketing'],
+            'salary': [75000, 70000, 60000]
+        })
+
+        asyncio.run(self.loader.upsert_indexed(initial_data, self.test_table, ['id']))
+        result = asyncio.run(self.loader.upsert_indexed(
+            mixed_data, self.test_table, ['id'], delta=True))
+
+        self.assertEqual((result.inserted, result.updated, result.skipped), (1, 1, 1))
+        pd.testing.assert_frame_equal(mixed_data, self.table_frame())
+
+    def test_indexed_delta_numeric_types(self):
+        """
+        Test that the delta mode skips rows whose numbers come back from the DB with another
+        type, ints stored in a Float column and nullable ints held as floats
+        """
+        readings = Table(
+            'test_readings',
+            self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('value', Float),
+            Column('count', Integer)
+        )
+        self.metadata.create_all(self.engine)
+        data = pd.DataFrame({'id': [1, 2], 'value': [2, 3], 'count': [1, None]})
+
+        asyncio.run(self.loader.upsert_indexed(data, readings, ['id']))
+        result = asyncio.run(self.loader.upsert_indexed(data, readings, ['id'], delta=True))
+
+        self.assertEqual((result.inserted, result.updated, result.skipped), (0, 0, 2))
+
+    def test_indexed_delta_hash_column(self):
+        """
+        Test that the delta mode compares with a stored hash column
+        """
+        hashed_table = Table(
+            'test_hashed',
+            self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('name', String(100)),
+            Column('row_hash', Integer)
+        )
+        self.metadata.create_all(self.engine)
+        initial_data = pd.DataFrame({'id': [1, 2], 'name': ['John Doe', 'Jane Smith']})
+        mixed_data = pd.DataFrame({'id': [1, 2, 3], 'name': ['John Doe', 'Jane Wilson', 'Bob']})
+
+        first = asyncio.run(self.loader.upsert_indexed(
+            initial_data, hashed_table, ['id'], delta=True, hash_column='row_hash'))
+        result = asyncio.run(self.loader.upsert_indexed(
+            mixed_data, hashed_table, ['id'], delta=True, hash_column='row_hash'))
+
+        self.assertEqual((first.inserted, first.updated, first.skipped), (2, 0, 0))
+        self.assertEqual((result.inserted, result.updated, result.skipped), (1, 1, 1))
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(hashed_table.c.name).order_by(hashed_table.c.id)).fetchall()
+        self.assertEqual([row[0] for row in rows], ['John Doe', 'Jane Wilson', 'Bob'])
+
+    def test_stream_commit_policy(self):
+        """
+        Test that upsert_stream loads every chunk and keeps the committed chunks on failure
+        """
+        async def chunks(fail):
+            yield pd.DataFrame({'id': [1, 2], 'name': ['John Doe', 'Jane Smith']})
+            yield pd.DataFrame({'id': [3], 'name': ['Bob Brown']})
+            if fail:
+                yield pd.DataFrame({'id': [4, 4], 'name': ['Ann Lee', 'Ann Lee']})
+
+        result = asyncio.run(self.loader.upsert_stream(
+            chunks(False), self.test_table, ['id'], commit_every=2))
+        self.assertEqual(result.processed, 3)
+        self.assertIsNone(result.inserted)
+
+        async def changes():
+            yield pd.DataFrame({'id': [1, 4], 'name': ['John Dee', 'Ann Lee']})
+            yield pd.DataFrame({'id': [2, 5], 'name': ['Jane Wilson', 'Tom Kay']})
+
+        result = asyncio.run(self.loader.upsert_stream(
+            changes(), self.test_table, ['id'], strategy="indexed"))
+        self.assertEqual((result.processed, result.inserted, result.updated), (4, 2, 2))
+        with self.engine.begin() as connection:
+            connection.execute(self.test_table.delete().where(self.test_table.c.id > 3))
+
+        with self.assertRaises(LoaderError):
+            asyncio.run(self.loader.upsert_stream(
+                chunks(True), self.test_table, ['id'], strategy="indexed"))
+        self.assertEqual(list(self.table_frame()['id']), [1, 2, 3])
+
+    def test_stream_atomic(self):
+        """
+        Test that an atomic upsert_stream loads nothing when a chunk fails
+        """
+        async def chunks():
+            yield pd.DataFrame({'id': [1, 2], 'name': ['John Doe', 'Jane Smith']})
+            yield pd.DataFrame({'id': [3, 3], 'name': ['Bob Brown', 'Bob Brown']})
+
+        with self.assertRaises(LoaderError):
+            asyncio.run(self.loader.upsert_stream(
+                chunks(), self.test_table, ['id'], strategy="indexed", atomic=True))
+        self.assertTrue(self.table_frame().empty)
+
+    def test_parallel_partitions(self):
+        """
+        Test that upsert_parallel loads every hash partition and reports each of them
+        """
+        data = pd.DataFrame({
+            'id': range(1, 101),
+            'name': [f'Employee {i}' for i in range(1, 101)],
+            'department': ['IT'] * 100,
+            'salary': [1000 * i for i in range(1, 101)]
+        })
+
+        asyncio.run(self.loader.upsert_parallel(data.iloc[:50], self.test_table, ['id']))
+        results = asyncio.run(self.loader.upsert_parallel(
+            data, self.test_table, ['id'], partitions=3, strategy="indexed"))
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(sum(result.processed for result in results), 100)
+        self.assertEqual(sum(result.inserted for result in results), 50)
+        pd.testing.assert_frame_equal(data, self.table_frame())
+
+    def test_parallel_partition_error(self):
+        """
+        Test that upsert_parallel raises a LoaderError naming the failed partitions
+        """
+        data = pd.DataFrame({'id': [1, 1, 2, 3], 'name': ['a', 'a', 'b', 'c']})
+
+        with self.assertRaisesRegex(LoaderError, "partition") as context:
+            asyncio.run(self.loader.upsert_parallel(
+                data, self.test_table, ['id'], partitions=2, strategy="indexed"))
+
+        error = context.exception
+        self.assertIsInstance(error, PartitionLoadError)
+        self.assertEqual(len(error.outcomes), 2)
+        self.assertEqual(len(error.failures), 1)
+        self.assertEqual(len(error.results), 1)
+        committed = sum(result.processed for result in error.results.values())
+        self.assertEqual(len(self.table_frame()), committed)
+
+    def test_db_work_off_event_loop(self):
+        """
+        Test that the statements run on the loader thread pool and not on the event loop
+        """
+        threads = set()
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record_thread(*_):
+            threads.add(threading.current_thread().name)
+
+        data = pd.DataFrame({'id': [1, 2], 'name': ['John Doe', 'Jane Smith']})
+        asyncio.run(self.loader.upsert(data, self.test_table, ['id']))
+        asyncio.run(self.loader.upsert_merge(data, self.test_table, ['id']))
+
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("arpaletl-loader") for name in threads))
+
+    @unittest.skipIf(importlib.util.find_spec("aiosqlite") is None, "aiosqlite is not installed")
+    def test_async_engine(self):
+        """
+        Test that use_async_engine runs the DB work on the async engine of the client
+        """
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(self.tmpdir.name, 'test.db')}")
+        threads = set()
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def do_connect(dbapi_connection, _):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(async_engine.sync_engine, "begin")
+        def do_begin(connection):
+            threads.add(threading.current_thread().name)
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self.db_client.get_async_engine = lambda: async_engine
+        loader = UpsertLoader(self.db_client, use_async_engine=True)
+        data = pd.DataFrame({
+            'id': [1, 2, 3],
+            'name': ['John Doe', 'Jane Smith', 'Bob Brown'],
+            'department': ['IT', 'HR', 'IT'],
+            'salary': [100, 200, 300]
+        })
+
+        async def run():
+            try:
+                await loader.upsert_merge(data.iloc[:2], self.test_table, ['id'])
+                return await loader.upsert_indexed(data, self.test_table, ['id'])
+            finally:
+                await async_engine.dispose()
+        result = asyncio.run(run())
+
+        self.assertEqual(result.processed, 3)
+        self.assertEqual(result.inserted, 1)
+        self.assertTrue(threads)
+        self.assertFalse(any(name.startswith("arpaletl-loader") for name in threads))
+        self.assertIsNone(loader._owned_executor)
+        pd.testing.assert_frame_equal(data, self.table_frame())
+
+    @unittest.skipIf(importlib.util.find_spec("aiosqlite") is None, "aiosqlite is not installed")
+    def test_async_engine_collect_errors(self):
+        """
+        Test that an async Oracle connection collects the rejected rows with savepoints
+        instead of the batch errors of the sync driver
+        """
+        async_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{os.path.join(self.tmpdir.name, 'test.db')}")
+
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def do_connect(dbapi_connection, _):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(async_engine.sync_engine, "begin")
+        def do_begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        records = [{'id': 1, 'name': 'John Doe'}, {'id': 1, 'name': 'John Dee'},
+                   {'id': 2, 'name': 'Jane Smith'}]
+
+        async def run():
+            try:
+                async with async_engine.connect() as connection:
+                    with mock.patch.object(async_engine.dialect, "name", "oracle"):
+                        errors = await connection.run_sync(
+                            _in_transaction, _execute_collecting,
+                            insert(self.test_table), records)
+                    return errors
+            finally:
+                await async_engine.dispose()
+        errors = asyncio.run(run())
+
+        self.assertEqual([offset for offset, _ in errors], [1])
+        self.assertEqual(list(self.table_frame()['name']), ['John Doe', 'Jane Smith'])
+
+    def test_oracle_merge_statement(self):
+        """
+        Test that the Oracle dialect gets a MERGE INTO ... USING statement
+        """
+        stmt = merge_statement(self.test_table, ['id'], ['id', 'name'], oracle.dialect())
+        sql = str(stmt.compile(dialect=oracle.dialect()))
+
+        self.assertIn("MERGE INTO test_employees t USING (SELECT :p0 AS id", sql)
+        self.assertIn("WHEN MATCHED THEN UPDATE SET t.name = s.name", sql)
+        self.assertIn("WHEN NOT MATCHED THEN INSERT (id, name) VALUES (s.id, s.name)", sql)
+
+    def test_oracle_merge_odd_column_names(self):
+        """
+        Test that Oracle merge binds columns that are not plain words, e.g. the
+        columns with a leading space of tests/blobs/test_csv
+        """
+        table = Table('readings', MetaData(), Column('id', Integer, primary_key=True),
+                      Column(' Age', Integer), Column('Sensor-Value', String(100)))
+        columns = ['id', ' Age', 'Sensor-Value']
+        stmt = merge_statement(table, ['id'], columns, oracle.dialect())
+        compiled = stmt.compile(dialect=oracle.dialect())
+
+        self.assertIn('(SELECT :p0 AS id, :p1 AS " Age", :p2 AS "Sensor-Value" FROM dual)',
+                      str(compiled))
+        self.assertEqual(sorted(compiled.binds), ['p0', 'p1', 'p2'])
+        self.assertEqual(merge_parameters([{'id': 1, ' Age': 30, 'Sensor-Value': 'a'}],
+                                          columns, oracle.dialect()),
+                         [{'p0': 1, 'p1': 30, 'p2': 'a'}])
@@ -1,6 +1,18 @@
 import unittest
 import asyncio
+import mmap
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pandas as pd
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from arpaletl.extractor.csvextractor import CsvExtractor
 from arpaletl.utils.arpaletlerrors import ResourceError
+from arpaletl.resource.httpcache import HttpCache
+from arpaletl.resource.retrypolicy import RetryPolicy
 from arpaletl.resource.webresource import WebResource
 
 
@@ -52,3 +64,301 @@ class TestWebResource(unittest.TestCase):
 
         # Use asyncio.run() to run the coroutine
         asyncio.run(run_test())
+
+
+class TestWebResourceRanges(unittest.TestCase):
+    """
+    Test class for the parallel range downloads of WebResource with a local aiohttp server
+    """
+
+    def setUp(self):
+        """
+        Create the archive served by the test server and record the requests
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / 'archive.bin'
+        self.payload = os.urandom(100_000)
+        self.path.write_bytes(self.payload)
+        self.ranges = []
+        self.active = 0
+        self.max_active = 0
+
+        async def ranged(request):
+            if request.method == "GET":
+                self.ranges.append(request.headers.get("Range"))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            return web.FileResponse(self.path)
+
+        async def plain(request):
+            if request.method == "GET":
+                self.ranges.append(request.headers.get("Range"))
+            return web.Response(body=self.payload)
+
+        async def ignoring(request):
+            if request.headers.get("Range") == "bytes=0-0":
+                return web.Response(body=self.payload[:1], status=206, headers={
+                    "Content-Range": f"bytes 0-0/{len(self.payload)}"})
+            return web.Response(body=self.payload)
+
+        async def headless(request):
+            if request.method == "HEAD":
+                raise web.HTTPMethodNotAllowed("HEAD", ["GET"])
+            return await ranged(request)
+
+        async def weak(request):
+            if request.method == "GET":
+                self.ranges.append(request.headers.get("Range"))
+            headers = {"ETag": 'W/"v1"'}
+            if request.headers.get("Range") == "bytes=0-0":
+                headers["Content-Range"] = f"bytes 0-0/{len(self.payload)}"
+                return web.Response(body=self.payload[:1], status=206, headers=headers)
+            return web.Response(body=self.payload, headers=headers)
+
+        self.routes = {"/ranged": ranged, "/plain": plain, "/ignoring": ignoring,
+                       "/headless": headless, "/weak": weak}
+
+    def tearDown(self):
+        """
+        Remove the temporary directory
+        """
+        self.tmpdir.cleanup()
+
+    def download(self, path, stream=False, **options):
+        """
+        Helper method that downloads a path of the test server
+        """
+        app = web.Application()
+        for route, handler in self.routes.items():
+            app.router.add_route("*", route, handler)
+
+        async def run_test():
+            async with TestServer(app) as server:
+                resource = WebResource(str(server.make_url(path)), chunk=4096, **options)
+                if stream:
+                    return b"".join([chunk async for chunk in resource.open_stream()])
+                return await resource.open()
+
+        return asyncio.run(run_test())
+
+    def test_segments(self):
+        """
+        Test that a server accepting ranges gets concurrent segment requests
+        and that the segments are reassembled in order
+        """
+        for path, stream in [("/ranged", False), ("/ranged", True), ("/headless", False)]:
+            with self.subTest(msg=f"{path} stream={stream}"):
+                self.ranges = []
+                self.max_active = 0
+                data = self.download(path, stream, segment_size=30_000, parallelism=3)
+
+                self.assertEqual(data, self.payload)
+                self.assertEqual(self.ranges[0], "bytes=0-0")
+                self.assertEqual(sorted(self.ranges[1:]), ["bytes=0-29999", "bytes=30000-59999",
+                                                           "bytes=60000-89999",
+                                                           "bytes=90000-99999"])
+                self.assertGreater(self.max_active, 1)
+                self.assertLessEqual(self.max_active, 3)
+
+    def test_single_stream_fallback(self):
+        """
+        Test that a server without ranges, a weak ETag, a small resource or disabled
+        segments are downloaded as a single stream
+        """
+        for path, options, probe in [("/plain", {"segment_size": 30_000}, ["bytes=0-0"]),
+                                     ("/weak", {"segment_size": 30_000}, ["bytes=0-0"]),
+                                     ("/ranged", {"segment_size": 200_000}, ["bytes=0-0"]),
+                                     ("/ranged", {}, [])]:
+            with self.subTest(msg=f"{path} {options}"):
+                self.ranges = []
+                self.assertEqual(self.download(path, **options), self.payload)
+                self.assertEqual(self.ranges, probe + [None])
+
+    def test_range_ignored(self):
+        """
+        Test that a server answering the probe with a range but the segments with
+        the whole resource fails
+        """
+        with self.assertRaises(ResourceError):
+            self.download("/ignoring", segment_size=30_000)
+
+    def test_spooled_buffer(self):
+        """
+        Test that a download larger than the threshold is spooled to a memory mapped file
+        and that a web CSV can be parsed in parallel byte ranges from its spool
+        """
+        rows = [f"{i},station {i % 7},{i * 0.5}" for i in range(5000)]
+        self.path.write_text("id,station,value\n" + "\n".join(rows) + "\n")
+        app = web.Application()
+        for route, handler in self.routes.items():
+            app.router.add_route("*", route, handler)
+
+        async def run_test():
+            async with TestServer(app) as server:
+                resource = WebResource(str(server.make_url("/ranged")), chunk=4096)
+                async with resource.open_buffer(10_000, self.tmpdir.name) as buffer:
+                    spooled = list(Path(self.tmpdir.name).glob("*.spool"))
+                    kind, data = type(buffer), buffer.read()
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    parallel = await CsvExtractor(resource).extract_parallel(3, executor)
+                return kind, data, spooled, parallel, await CsvExtractor(resource).extract()
+
+        kind, data, spooled, parallel, expected = asyncio.run(run_test())
+
+        self.assertEqual((kind, data), (mmap.mmap, self.path.read_bytes()))
+        self.assertEqual(len(spooled), 1)
+        self.assertFalse(list(Path(self.tmpdir.name).glob("*.spool")))
+        pd.testing.assert_frame_equal(parallel, expected)
+
+
+class TestWebResourceRetry(unittest.TestCase):
+    """
+    Test class for the retries and resumed downloads of WebResource with a local aiohttp server
+    """
+
+    def setUp(self):
+        """
+        Create the payload served by the test server and record the requests
+        """
+        self.payload = os.urandom(50_000)
+        self.failures = 2
+        self.requests = []
+
+        async def flaky(request):
+            value = request.headers.get("Range")
+            self.requests.append(value)
+            start = int(value[len("bytes="):-1]) if value else 0
+            if not self.resume:
+                start = 0
+            body = self.payload[start:]
+            headers = {"ETag": '"v1"', "Content-Length": str(len(body))}
+            status = 200
+            if start:
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"
+            if self.failures:
+                self.failures -= 1
+                response = web.StreamResponse(status=status, headers=headers)
+                await response.prepare(request)
+                await response.write(body[:len(body) // 3])
+                request.transport.close()
+                return response
+            return web.Response(body=body, status=status, headers=headers)
+
+        async def unavailable(request):
+            self.requests.append(None)
+            if self.failures:
+                self.failures -= 1
+                return web.Response(status=503)
+            return web.Response(body=self.payload)
+
+        async def missing(request):
+            self.requests.append(None)
+            return web.Response(status=404)
+
+        self.resume = True
+        self.routes = {"/flaky": flaky, "/unavailable": unavailable, "/missing": missing}
+
+    def download(self, path, stream=True, **options):
+        """
+        Helper method that downloads a path of the test server
+        """
+        app = web.Application()
+        for route, handler in self.routes.items():
+            app.router.add_get(route, handler)
+
+        async def run_test():
+            async with TestServer(app) as server:
+                resource = WebResource(str(server.make_url(path)), chunk=4096, **options)
+                if stream:
+                    return b"".join([chunk async for chunk in resource.open_stream()])
+                return await resource.open()
+
+        return asyncio.run(run_test())
+
+    def test_resume(self):
+        """
+        Test that an interrupted stream is resumed from the last received byte
+        """
+        retry = RetryPolicy(attempts=2, backoff=0.01)
+        for stream in (True, False):
+            with self.subTest(msg=f"stream={stream}"):
+                self.failures = 2
+                self.requests = []
+                self.assertEqual(self.download("/flaky", stream, retry=retry), self.payload)
+                self.assertEqual(len(self.requests), 3)
+                self.assertIsNone(self.requests[0])
+                self.assertTrue(all(value.startswith("bytes=") for value in self.requests[1:]))
+
+    def test_restart(self):
+        """
+        Test that received bytes are skipped when the download is not resumed
+        """
+        self.resume = False
+        for retry in (RetryPolicy(backoff=0.01, resume=False), RetryPolicy(backoff=0.01)):
+            with self.subTest(msg=f"resume={retry.resume}"):
+                self.failures = 1
+                self.assertEqual(self.download("/flaky", retry=retry), self.payload)
+
+    def test_statuses(self):
+        """
+        Test that transient statuses are retried and the other ones or exhausted
+        retries raise a ResourceError
+        """
+        retry = RetryPolicy(attempts=2, backoff=0.01, jitter=0)
+        self.assertEqual(self.download("/unavailable", retry=retry), self.payload)
+        self.assertEqual(len(self.requests), 3)
+
+        for path, failures in (("/missing", 0), ("/unavailable", 3), ("/flaky", 1)):
+            with self.subTest(msg=path):
+                self.requests = []
+                self.failures = failures
+                options = {} if path == "/flaky" else {"retry": retry}
+                with self.assertRaises(ResourceError):
+                    self.download(path, **options)
+                self.assertEqual(len(self.requests), 1 if path != "/unavailable" else 3)
+
+    def test_cached_retry(self):
+        """
+        Test that cached downloads retry failed requests and resume interrupted bodies
+        into the cache
+        """
+        retry = RetryPolicy(attempts=2, backoff=0.01, jitter=0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = HttpCache(tmpdir)
+            for path, stream in (("/unavailable", True), ("/flaky", True), ("/flaky", False)):
+                with self.subTest(msg=f"{path} stream={stream}"):
+                    self.failures = 2
+                    self.requests = []
+                    data = self.download(path, stream, retry=retry, cache=cache)
+
+                    self.assertEqual(data, self.payload)
+                    self.assertEqual(len(self.requests), 3)
+            bodies = [body.read_bytes() for body in Path(tmpdir).glob("*.body")]
+
+        self.assertEqual(bodies, [self.payload] * 2)
+
+    def test_methods(self):
+        """
+        Test that only the methods of the policy are retried
+        """
+        retry = RetryPolicy(attempts=2, backoff=0.01, methods=("HEAD",))
+        error = aiohttp.ClientConnectionError()
+
+        self.assertFalse(retry.retryable(error, "GET"))
+        self.assertTrue(RetryPolicy().retryable(error, "get"))
+        self.assertFalse(RetryPolicy().retryable(error, "POST"))
+        with self.assertRaises(ResourceError):
+            self.download("/unavailable", retry=retry)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_delay(self):
+        """
+        Test that the delay grows exponentially up to the maximum with jitter below it
+        """
+        retry = RetryPolicy(backoff=1, max_backoff=5, jitter=0)
+        self.assertEqual([retry.delay(attempt) for attempt in range(1, 5)], [1, 2, 4, 5])
+        jittered = RetryPolicy(backoff=1, jitter=0.5).delay(2)
+        self.assertTrue(1 <= jittered <= 2)